@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Per-op microbenchmark for Interpreter.run_code.
+
+Every case is timed twice: as the full expression and with only its operands.
+The difference is what the op itself costs, dispatch included.
+
+    python bench/bench_ops.py [--number N] [--repeat R]
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+import interpreter  # noqa: E402
+
+SETUP = """
+ts rizz a tun tun tun tun sahur pmo
+ts rizz b tun tun sahur pmo
+ts rizz f tf legit 2.5 bro pmo
+ts rizz s legit hello world bro pmo
+ts rizz l ls pmo
+ts sybau ad l a pmo
+ts sybau ad l b pmo
+ts rizz t sigma pmo
+LEBRON id x ngl
+    ts dih x pmo
+GOAT
+"""
+
+# (label, expression, operands only)
+CASES = [
+    ("tun literal", "tun tun tun sahur", None),
+    ("variable", "a", None),
+    ("touch", "touch a b", "a b"),
+    ("#shrink", "#shrink a b", "a b"),
+    ("cavendish", "cavendish a b", "a b"),
+    ("big25", "big25 a b", "a b"),
+    ("bigf", "bigf f b", "f b"),
+    ("crockpot", "crockpot a b", "a b"),
+    ("mogs", "mogs a b", "a b"),
+    ("vibes", "vibes a b", "a b"),
+    ("chill", "chill t t", "t t"),
+    ("grind", "grind t t", "t t"),
+    ("L", "L t", "t"),
+    ("stroke", "stroke s s", "s s"),
+    ("gt", "gt l b", "l b"),
+    ("ad", "ad ls a", "ls a"),
+    ("girth", "girth l", "l"),
+    ("BOOM", "BOOM s", "s"),
+    ("sayong", "sayong a", "a"),
+    ("spill", "spill f", "f"),
+    ("lowkey", "lowkey a", "a"),
+    ("tf", "tf a", "a"),
+    ("call", "id a", "a"),
+]
+
+
+def compile_expr(text):
+    # Compiled along with SETUP so the parser knows the arity of id.
+    tokens, lines = interpreter._lex_with_lines(f"{SETUP}\nts dih {text} pmo")
+    return interpreter.assemble(interpreter.Parser(tokens, lines).parse()[-1:])
+
+
+def time_code(interp, code, number, repeat):
+    run = interp.run_code
+    best = min(timeit.repeat(lambda: run(code), number=number, repeat=repeat))
+    return best / number * 1e9
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--number", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    interp = interpreter.Interpreter()
+    interp.run_source(SETUP)
+    print(f"{'op':<14}{'expr ns':>10}{'op ns':>10}")
+    total = 0.0
+    for label, expr, operands in CASES:
+        full = time_code(interp, compile_expr(expr), args.number, args.repeat)
+        own = full
+        if operands is not None:
+            own = full - time_code(interp, compile_expr(operands), args.number, args.repeat)
+        total += own
+        print(f"{label:<14}{full:>10.1f}{own:>10.1f}")
+    print(f"{'mean op':<14}{'':>10}{total / len(CASES):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the interpreter and the language server.
+
+Each case is timed with timeit, taking the best of --repeat runs. The results
+are written to a JSON file. With --baseline they are compared against a
+stored run, and the exit status is 1 if any case got slower by more than
+--threshold. Timings on a shared machine move by 30% or more from run to run,
+so a case over the threshold is measured again, up to --recheck more times,
+and only counts as a regression if none of those runs is back under it.
+
+Absolute timings only compare on the machine that took them, so no baseline
+is committed. Record one with the base revision checked out, then gate the
+change against it on the same machine:
+
+    python bench/bench_suite.py --record                       # base revision
+    python bench/bench_suite.py --baseline bench/baseline.json # the change
+
+A baseline recorded on another host or Python is refused (exit status 2).
+
+    python bench/bench_suite.py [--output FILE] [--baseline FILE]
+                                [--threshold 0.25] [--recheck 3]
+                                [--record [FILE]] [--repeat R] [-k SUBSTRING]
+
+The language server cases need pygls and are skipped without it.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+from types import SimpleNamespace as NS
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent / "server"))
+import interpreter  # noqa: E402
+
+BASELINE = here / "baseline.json"
+RESULTS = here / "results.json"
+
+
+def compile_source(text):
+    tokens, lines = interpreter._lex_with_lines(text)
+    return interpreter.assemble(interpreter.Parser(tokens, lines).parse())
+
+
+def tun(n):
+    return " ".join(["tun"] * (n + 1)) + " sahur"
+
+
+def program(text, modules=(), natives=True, **globals_):
+    """A callable that runs text on a warmed-up interpreter."""
+    body = compile_source(text)
+    interp = interpreter.Interpreter()
+    interp.use_natives = natives
+    interp.preload(*modules)
+
+    def run():
+        interp.reset()
+        for name, value in globals_.items():
+            interp.sym[name] = value[:] if isinstance(value, list) else value
+        interp.run_code(body)
+    return run
+
+
+def interpreter_cases():
+    rng = random.Random(17)
+    for n in (1000, 100000):
+        data = [rng.randrange(1 << 20) for _ in range(n)]
+        yield f"sort native {n}", program("REF list DO SOMETHING\nts sybau sort l pmo", ["list"], l=data)
+    for n in (30, 100, 300):
+        data = [rng.randrange(1 << 20) for _ in range(n)]
+        yield f"sort tspmo {n}", program("REF list DO SOMETHING\nts sybau sort l pmo", ["list"],
+                                         natives=False, l=data)
+
+    yield "factorial tspmo 100", program("REF math DO SOMETHING\nts sybau ! k pmo", ["math"],
+                                         natives=False, k=100)
+    # consecutive Fibonacci numbers are the worst case for Euclid
+    yield "gcd tspmo fib(60)", program("REF math DO SOMETHING\nts sybau gcd a b pmo", ["math"],
+                                       natives=False, a=1548008755920, b=956722026041)
+
+    yield "nested kid 30^3", program(f"""
+ts rizz s {tun(0)} pmo
+ts rizz i {tun(0)} pmo
+ts sybau mogs {tun(30)} i yo pmo
+ts kid pmo
+    ts rizz j {tun(0)} pmo
+    ts sybau mogs {tun(30)} j yo pmo
+    ts kid pmo
+        ts rizz k {tun(0)} pmo
+        ts sybau mogs {tun(30)} k yo pmo
+        ts kid pmo
+            ts rizz s touch s k pmo
+            ts rizz k touch k {tun(1)} pmo
+        ts gurt pmo
+        ts rizz j touch j {tun(1)} pmo
+    ts gurt pmo
+    ts rizz i touch i {tun(1)} pmo
+ts gurt pmo
+""")
+
+    yield "calls fib(15)", program(f"""
+LEBRON fib n ngl
+ts hawk mogs {tun(2)} n pmo
+ts lion pmo
+ts dih n pmo
+ts fr pmo
+ts tiger pmo
+ts rizz a #shrink n {tun(1)} pmo
+ts rizz b #shrink n {tun(2)} pmo
+ts rizz x fib a pmo
+ts rizz y fib b pmo
+ts dih touch x y pmo
+ts fr pmo
+ts ong pmo
+GOAT
+ts sybau fib k pmo
+""", k=15)
+
+    big = f"ts rizz n {tun(100000)} pmo\nts rizz m touch n n pmo\n"
+    interp = interpreter.Interpreter()
+    yield "int literal 100k compile+run", lambda: interp.run_code(compile_source(big))
+
+
+def synthetic_document(lines):
+    out = ["REF list, math DO SOMETHING"]
+    f = 0
+    while len(out) < lines:
+        out += [
+            f"LEBRON fn{f} a b ngl",
+            f"    -> function number {f} <-",
+            "    ts rizz t touch a b pmo",
+            "    ts sybau mogs t a yo pmo",
+            "    ts kid pmo",
+            f"        ts rizz t #shrink t {tun(1)} pmo",
+            "    ts gurt pmo",
+            "    ts dih t pmo",
+            "GOAT",
+            f"ts rizz g{f} fn{f} {f} {f} pmo",
+            f"ts yap legit value of g{f} bro pmo",
+        ]
+        f += 1
+    return "\n".join(out[:lines])
+
+
+def server_cases():
+    try:
+        import server
+    except ImportError as e:
+        print(f"skipping language server cases: {e}", file=sys.stderr)
+        return
+    text = synthetic_document(10000)
+    uri = "file:///bench/synthetic.tspmo"
+    index = server.documents[uri] = server.DocIndex(text)
+    server.symbols.build()
+    line = len(index.lines) // 2
+    col = len(index.lines[line]) // 2
+    pos = NS(line=line, character=col)
+    edits = [NS(range=NS(start=pos, end=pos), text="x"),
+             NS(range=NS(start=pos, end=NS(line=line, character=col + 1)), text="")]
+    doc = NS(text_document=NS(uri=uri), position=pos)
+
+    def edit():
+        # type and delete one character, so the document ends up unchanged
+        index.apply(edits[0])
+        index.apply(edits[1])
+
+    yield "lsp tokenize 10k lines", lambda: server.DocIndex(text)
+    yield "lsp edit+lint 10k lines", lambda: (edit(), server.lint_text(index))
+    yield "lsp edit+completions 10k lines", lambda: (edit(), server.completions(None, doc))
+    # one hover takes about a microsecond, too little to time on its own
+    hovers = [NS(text_document=NS(uri=uri), position=NS(line=ln, character=0))
+              for ln in range(0, len(index.lines), len(index.lines) // 1000)]
+    yield "lsp hover x1000 10k lines", lambda: [server.hover(None, h) for h in hovers]
+
+
+def machine():
+    return f"{platform.node()} {platform.machine()} {platform.processor()}".strip()
+
+
+def measure(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number, number
+
+
+def compare(results, baseline, threshold, remeasure=None, recheck=0):
+    """
+    Print each case against the baseline and count the regressions. A case
+    over threshold is timed again with remeasure(name), up to recheck times,
+    keeping the best timing.
+    """
+    regressions = 0
+    print(f"\n{'case':<34}{'baseline ms':>13}{'now ms':>11}{'change':>9}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34}{'-':>13}{res['seconds'] * 1e3:>11.3f}{'new':>9}")
+            continue
+        change = res["seconds"] / base["seconds"] - 1
+        tries = recheck if remeasure is not None else 0
+        while change > threshold and tries:
+            tries -= 1
+            res["seconds"] = min(res["seconds"], remeasure(name))
+            change = res["seconds"] / base["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<34}{base['seconds'] * 1e3:>13.3f}{res['seconds'] * 1e3:>11.3f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--output", type=Path, default=RESULTS)
+    ap.add_argument("--baseline", type=Path, default=None)
+    ap.add_argument("--threshold", type=float, default=0.25)
+    ap.add_argument("--recheck", type=int, default=3,
+                    help="times to re-measure a case over the threshold")
+    ap.add_argument("--record", type=Path, nargs="?", const=BASELINE, default=None,
+                    help=f"save this run as the baseline (default {BASELINE.relative_to(here.parent)})")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("-k", dest="only", default=None, help="only run cases containing this text")
+    args = ap.parse_args()
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if (baseline.get("machine"), baseline.get("python")) != (machine(), platform.python_version()):
+            print(f"{args.baseline} was recorded on {baseline.get('machine')} with Python "
+                  f"{baseline.get('python')}; record a baseline here with --record first",
+                  file=sys.stderr)
+            sys.exit(2)
+
+    results = {}
+    fns = {}
+    print(f"{'case':<34}{'ms':>11}{'runs':>8}")
+    for cases in (interpreter_cases, server_cases):
+        for name, fn in cases():
+            if args.only and args.only not in name:
+                continue
+            fns[name] = fn
+            seconds, number = measure(fn, args.repeat)
+            results[name] = {"seconds": seconds, "number": number, "repeat": args.repeat}
+            print(f"{name:<34}{seconds * 1e3:>11.3f}{number:>8}")
+
+    regressions = 0
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], args.threshold,
+                              lambda name: measure(fns[name], args.repeat)[0], args.recheck)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": machine(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nresults written to {args.output}")
+    if args.record is not None:
+        args.record.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline saved to {args.record}")
+
+    if regressions:
+        print(f"\n{regressions} case(s) slower than baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
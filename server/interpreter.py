@@ -1,702 +1,1727 @@
-#!/usr/bin/env python3
-
-import sys
-from collections import deque
-from copy import deepcopy
-from pathlib import Path
-import warnings
-warnings.filterwarnings("ignore", category=SyntaxWarning)
-
-
-def _lex_with_lines(text: str):
-    tokens = []
-    lines  = []
-    for lineno, raw in enumerate(text.splitlines(), start=1):
-        parts = raw.split()
-        if not parts:
-            continue
-        tokens.extend(parts)
-        lines.extend([lineno] * len(parts))
-    return tokens, lines
-
-
-def run_file(path: str) -> int:
-    try:
-        with open(path, "r") as f:
-            file_contents = f.read()
-        tokens, lines = _lex_with_lines(file_contents)
-        LexParse(tokens, line_map=lines)
-        return 0
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        return 1
-
-
-state = "Start"
-cval = 0
-sym = {}
-funcs = {}
-execList = deque()
-stmt = 0
-debug = False
-collecting = False
-depth = -1
-bodyStack = []
-condStack = deque()
-flagStack = deque()
-
-root = Path(__file__).resolve().parent
-stdlib_dir = root / "stdlib"
-userlib_dir = root / "userlib"
-pmo_files = [p.name for p in stdlib_dir.glob("*.pmo") if p.is_file()]
-pmo_user_files = [p.name for p in userlib_dir.glob("*.pmo") if p.is_file()]
-stdlib = [Path(fn).stem for fn in pmo_files]
-userlib = [Path(fn).stem for fn in pmo_user_files]
-deps = []
-
-
-class Function:
-    def __init__(self):
-        self.contents = []
-        self.params = []
-
-    def do(self, args=None, call_line: int = -1):
-        global state
-        local_sym = {}
-        wait = []
-        if args is None:
-            args = []
-        if len(args) != len(self.params):
-            raise Exception(f"Args bad in function with params {self.params}")
-        newContents = []
-        newLines = []
-        for i in range(len(args)):
-            if isinstance(args[i], int):
-                args[i] = "tun " * (int(args[i]) + 1) + "sahur"
-            elif isinstance(args[i], str):
-                args[i] = "legit " + args[i] + " bro"
-            elif isinstance(args[i], list):
-                wait.append((i, args[i]))
-                continue
-            elif isinstance(args[i], float):
-                args[i] = "tf legit " + str(args[i]) + " bro"
-            elif args[i]:
-                args[i] = "sigma"
-            elif not args[i]:
-                args[i] = "beta"
-            local_sym[self.params[i]] = args[i]
-            t = f"ts rizz {self.params[i]} {args[i]} pmo"
-            for c in t.split():
-                newContents.append(c)
-                newLines.append(call_line)
-        for t in wait:
-            local_sym[self.params[t[0]]] = t[1]
-        for c in self.contents:
-            newContents.append(c)
-            newLines.append(call_line)
-        state = "Start"
-        res = LexParse(contents=newContents, lexto=deque(), loc=local_sym, line_map=newLines)
-        state = "End"
-        return res
-
-
-reserved = {"ts", "pmo", "rizz", "tun", "sahur", "sigma", "beta", "touch", "#shrink", "cavendish", "big25", "crockpot",
-            "chill", "grind", "L", "+", "-", "*", "/", "%", "or", "and", "not", "print", "yap", "set", "mogs", "vibes",
-            "hawk", "if", "lion", "then", "tiger", "else", "fr", "ong", "yo", "kid", "gurt", "legit", "bro", "sayong",
-            "spill", "chat?", "cond", "sybau", "GOAT", "LEBRON", "ngl", "legoat", "dih", "REF", "DO", "SOMETHING",
-            "stroke", "lowkey", "tf", "->", "<-", "bigf", "./", "ls", "gt", "ad", "rm", "[]", "get", "add", "remove",
-            "pt", "put", "girth", "BOOM", "len", "ret"}
-
-
-def LexParse(contents, lexto=execList, loc=None, line_map=None):
-    global state
-    global cval
-    global bodyStack
-    global collecting
-    global depth
-    prestate = None
-    i = 0
-    r = None
-    if line_map is None:
-        line_map = [1] * len(contents)
-    current_stmt_start_line = None
-
-    def _err(msg):
-        ln = line_map[i] if 0 <= i < len(line_map) else -1
-        raise Exception(f"Line {ln}: {msg}")
-
-    while i < len(contents):
-        if debug:
-            print("exec", lexto)
-            print('state', state)
-        c = contents[i]
-        if c == "->":
-            prestate = state
-            state = "Comment"
-            i += 1
-            c = contents[i]
-        elif state == "Start":
-            current_stmt_start_line = line_map[i]
-            if c == "ts":
-                state = "ts"
-            elif c == "LEBRON":
-                i += 1
-                c = contents[i]
-                temp = Function()
-                funcs[c] = temp
-                i += 1
-                c = contents[i]
-                while c != "ngl":
-                    temp.params.append(c)
-                    i += 1
-                    c = contents[i]
-                i += 1
-                c = contents[i]
-                while c != "GOAT":
-                    temp.contents.append(c)
-                    i += 1
-                    c = contents[i]
-
-            elif c == "REF":
-                i += 1
-                c = contents[i]
-                while c != "DO":
-                    if "," in c:
-                        c = c.replace(",", "")
-                    deps.append(c)
-                    i += 1
-                    c = contents[i]
-                i += 1
-                c = contents[i]
-                if c != "SOMETHING":
-                    _err("Failed to correctly import modules. Are you closing with DO SOMETHING?")
-                for j in deps:
-                    if j in stdlib:
-                        with open("stdlib/" + j + ".pmo") as file:
-                            tkns, lns = _lex_with_lines(file.read())
-                            LexParse(tkns, line_map=lns)
-                    elif j in userlib:
-                        with open("/userlib/" + j + "pmo") as file:
-                            tkns, lns = _lex_with_lines(file.read())
-                            LexParse(tkns, line_map=lns)
-                    else:
-                        _err(f"Failed to load module {j}. It is either missing from the stdlib, or you forgot to add it to userlib.")
-            else:
-                _err(f"Commands must start with ts or LEBRON stmt{stmt + 1}")
-
-        elif state == "ts":
-            if c == "yap":
-                state = "E"
-                lexto.append("print")
-
-            elif c == "rizz":
-                state = "ID"
-
-            elif c == "sybau":
-                state = "E"
-
-            elif c == "hawk":
-                state = "E"
-                lexto.append("check")
-
-            elif c == "lion":
-                if debug:
-                    print("lion", flagStack[-1])
-                if not flagStack[-1]:
-                    state = "skip"
-                else:
-                    state = "End"
-
-            elif c == "tiger":
-                if debug:
-                    print("tiger", flagStack[-1])
-                if flagStack[-1]:
-                    state = "skip"
-                else:
-                    state = "End"
-
-            elif c == "fr":
-                state = "End"
-
-            elif c == "ong":
-                flagStack.pop()
-                state = "End"
-
-            elif c == "pt":
-                lexto.append("put")
-                state = "E"
-
-            elif c == "dih":
-                lexto.append("setReturn")
-                state = "E"
-
-            elif c == "kid":
-                i += 1
-                c = contents[i]
-                if c != "pmo":
-                    _err(f"Pmo expected stmt {stmt + 1}")
-                depth += 1
-                myDepth = depth
-                bodyStack.append([])
-                i += 1
-                c = contents[i]
-                level = 1
-                while True:
-                    if c == "kid":
-                        level += 1
-                    elif c == "gurt":
-                        level -= 1
-                        if level == 0:
-                            break
-                    bodyStack[myDepth].append(c)
-                    i += 1
-                    c = contents[i]
-                bodyStack[myDepth].pop(-1)
-                state = "Start"
-                try:
-                    while execute(deepcopy(condStack[myDepth]), loc=loc, stmt_line=current_stmt_start_line):
-                        LexParse(deepcopy(bodyStack[myDepth]), loc=loc, lexto=deque(), line_map=[current_stmt_start_line]*len(bodyStack[myDepth]))
-                except Exception as e:
-                    raise Exception(f"Line {current_stmt_start_line}: {e}")
-                depth -= 1
-                bodyStack.pop(myDepth)
-                i += 1
-                c = contents[i]
-                if c != "pmo":
-                    _err(f"Pmo expected stmt {stmt + 1}")
-                i += 1
-                continue
-
-            else:
-                _err(f"Assignment or Function Expected stmt {stmt + 1} {c}")
-
-        elif state == "ID":
-            if c in reserved:
-                _err(f"{c} is reserved by the language stmt {stmt + 1}")
-            else:
-                lexto.append(c)
-                lexto.append("set")
-                state = "E"
-
-        elif state == "E":
-            if c == "touch":
-                lexto.append("+")
-
-            elif c == "#shrink":
-                lexto.append("-")
-
-            elif c == "cavendish":
-                lexto.append("*")
-
-            elif c == "big25":
-                lexto.append("/")
-
-            elif c == "bigf":
-                lexto.append("./")
-
-            elif c == "crockpot":
-                lexto.append("%")
-
-            elif c == "mogs":
-                lexto.append(">")
-
-            elif c == "vibes":
-                lexto.append("==")
-
-            elif c == "chill":
-                lexto.append("or")
-
-            elif c == "grind":
-                lexto.append("and")
-
-            elif c == "L":
-                lexto.append("not")
-
-            elif c == "stroke":
-                lexto.append("concat")
-
-            elif c == "sayong":
-                lexto.append("tobool")
-
-            elif c == "spill":
-                lexto.append("toint")
-
-            elif c == "lowkey":
-                lexto.append("tostring")
-
-            elif c == "tf":
-                lexto.append("tofloat")
-
-            elif c == "tun":
-                cval = 0
-                state = "tun"
-
-            elif c == "legit":
-                cval = ""
-                state = "legit"
-
-            elif c == "chat?":
-                lexto.append("input")
-
-            elif c == "sigma":
-                lexto.append(True)
-                state = "End"
-
-            elif c == "beta":
-                lexto.append(False)
-                state = "End"
-
-            elif c == "ls":
-                lexto.append([])
-                state = "End"
-
-            elif c == "ad":
-                lexto.append("add")
-
-            elif c == "gt":
-                lexto.append("get")
-
-            elif c == "rm":
-                lexto.append("remove")
-
-            elif c == "BOOM":
-                lexto.append("split")
-
-            elif c == "girth":
-                lexto.append("len")
-
-            elif c in sym:
-                lexto.append(c)
-                state = "End"
-
-            elif loc is not None and c in loc:
-                lexto.append(c)
-                state = "End"
-
-            elif c in funcs:
-                a = c
-                argc = len(funcs[c].params)
-                while argc:
-                    i += 1
-                    c = contents[i]
-                    a += " " + c
-                    argc -= 1
-                lexto.append(a)
-                state = "End"
-
-            else:
-                _err(f"Not a valid Expression stmt {stmt + 1} {c}")
-
-        elif state == "tun":
-            if c == "tun":
-                cval += 1
-
-            elif c == "sahur":
-                lexto.append(cval)
-                state = "End"
-
-            else:
-                _err(f"Int Interrupt stmt {stmt + 1}")
-
-        elif state == "legit":
-            if c == "bro":
-                if cval != "":
-                    cval = cval[:len(cval) - 1]
-                lexto.append(cval)
-                lexto.append("Str")
-                state = "End"
-            else:
-                cval += c + " "
-
-        elif state == "End":
-            if c == "yo":
-                lexto.append("cond")
-
-            elif c == "pmo":
-                try:
-                    m = execute(lexto, loc, stmt_line=current_stmt_start_line)
-                except Exception as e:
-                    raise Exception(f"Line {current_stmt_start_line}: {e}")
-                if m is not None:
-                    r = m
-                state = "Start"
-
-            else:
-                state = "E"
-                i -= 1
-
-        elif state == "skip":
-            if debug:
-                print("Skipping")
-            while c != "fr":
-                i += 1
-                c = contents[i]
-            state = "End"
-
-        elif state == "Comment":
-            while c != "<-":
-                i += 1
-                c = contents[i]
-            state = prestate
-            prestate = None
-
-        i += 1
-    return r
-
-
-def trans(value):
-    if isinstance(value, bool) and not (value is 1 or value is 0):
-        return "sigma" if value else "beta"
-    elif isinstance(value, int):
-        return (value + 1) * "tun " + "sahur"
-    elif isinstance(value, str):
-        return "legit " + value + " bro"
-    elif isinstance(value, float):
-        return "ts tf " + str(value)
-    elif isinstance(value, list):
-        return "ls " + str(value)
-
-
-def execute(execL=execList, loc=None, stmt_line: int | None = None):
-    global stmt
-    global flagStack
-    global collecting
-    if debug:
-        print("Conds", condStack)
-        print(sym)
-        print(loc)
-    flag = None
-    if execL == execList:
-        stmt += 1
-    temp = None
-    setting = False
-    literal = False
-    ret = None
-    nxt = deque()
-
-    def _wrap_err(msg_or_exc):
-        base = str(msg_or_exc)
-        if stmt_line is not None:
-            return Exception(f"Line {stmt_line}: {base}")
-        return Exception(base)
-
-    try:
-        while execL:
-            if debug:
-                print(execL)
-                print(nxt)
-                print(temp)
-                print()
-            e = execL.pop()
-            if literal:
-                if temp is None:
-                    temp = e
-                else:
-                    nxt.append(e)
-                literal = False
-            elif isinstance(e, bool) and not (e is 1 or e is 0):
-                if temp is None:
-                    temp = e
-                else:
-                    nxt.append(e)
-            elif isinstance(e, int):
-                if temp is None:
-                    temp = e
-                else:
-                    nxt.append(e)
-            elif isinstance(e, float):
-                if temp is None:
-                    temp = e
-                else:
-                    nxt.append(e)
-            elif isinstance(e, list):
-                if temp is None:
-                    temp = e
-                else:
-                    nxt.append(e)
-            elif e == "+":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() + nxt.pop())
-                else:
-                    temp += nxt.pop()
-            elif e == "-":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop()-nxt.pop())
-                else:
-                    temp = nxt.pop() - temp
-            elif e == "*":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() * nxt.pop())
-                else:
-                    temp = nxt.pop() * temp
-            elif e == "/":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() // nxt.pop())
-                else:
-                    temp = nxt.pop() // temp
-            elif e == "./":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() / nxt.pop())
-                else:
-                    temp = nxt.pop() / temp
-            elif e == "%":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() % nxt.pop())
-                else:
-                    temp = nxt.pop() % temp
-            elif e == ">":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() > nxt.pop())
-                else:
-                    temp = nxt.pop() > temp
-            elif e == "==":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() == nxt.pop())
-                else:
-                    temp = nxt.pop() == temp
-            elif e == "or":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() or nxt.pop())
-                else:
-                    temp = nxt.pop() or temp
-            elif e == "and":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop() and nxt.pop())
-                else:
-                    temp = nxt.pop() and temp
-            elif e == "not":
-                if nxt:
-                    nxt[-1] = not nxt[-1]
-                else:
-                    temp = not temp
-            elif e == "concat":
-                if len(nxt) > 1:
-                    tmp = nxt.pop()
-                    nxt.append(nxt.pop() + tmp)
-                else:
-                    temp = nxt.pop() + temp
-            elif e == "add":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop().append(nxt.pop()))
-                else:
-                    temp = nxt.pop().append(temp)
-            elif e == "get":
-                if len(nxt) > 1:
-                    nxt.append(nxt.pop()[nxt.pop()])
-                else:
-                    temp = nxt.pop()[temp]
-            elif e == "remove":
-                if nxt:
-                    nxt[-1].pop(-1)
-                else:
-                    temp.pop(-1)
-
-            elif e == "tobool":
-                if nxt:
-                    nxt[-1] = bool(nxt[-1])
-                else:
-                    temp = bool(temp)
-            elif e == "toint":
-                if nxt:
-                    nxt[-1] = int(nxt[-1])
-                else:
-                    temp = int(temp)
-            elif e == "tostring":
-                if nxt:
-                    nxt[-1] = str(nxt[-1])
-                else:
-                    temp = str(temp)
-            elif e == "tofloat":
-                if nxt:
-                    nxt[-1] = float(nxt[-1])
-                else:
-                    temp = float(temp)
-            elif e == "put":
-                if len(nxt) != 2:
-                    raise Exception("Incorrect array put")
-                arr = nxt.pop()
-                ind = nxt.pop()
-                arr[ind] = temp
-            elif e == "split":
-                if nxt:
-                    nxt[-1] = nxt[-1].split()
-                else:
-                    temp = temp.split()
-            elif e == "len":
-                if nxt:
-                    nxt[-1] = len(nxt[-1])
-                else:
-                    temp = len(temp)
-            elif e == "print":
-                print(trans(temp), f"({temp})")
-            elif e == "check":
-                flag = bool(temp)
-            elif e == "cond":
-                condStack.append(deque([deepcopy(i) for i in execL]))
-            elif e == "collect":
-                collecting = True
-            elif e == "clear":
-                temp = None
-            elif e == "input":
-                execL.append(input(temp))
-                execL.append("Str")
-            elif e == "Str":
-                literal = True
-            elif e == "set":
-                setting = True
-            elif e == "setReturn":
-                ret = temp
-            else:
-                parts = e.split()
-                if parts[0] in funcs:
-                    fname = parts[0]
-                    rawArgs = parts[1:]
-                    resolved = []
-                    for a in rawArgs:
-                        if isinstance(a, (int, bool)):
-                            resolved.append(a)
-                        elif isinstance(a, str) and a.isdigit():
-                            resolved.append(int(a))
-                        elif loc is not None and a in loc:
-                            resolved.append(loc[a])
-                        elif a in sym:
-                            resolved.append(sym[a])
-                        else:
-                            raise Exception(f"Unknown argument {a!r} for function {fname}")
-                    res = funcs[fname].do(args=resolved, call_line=stmt_line if stmt_line is not None else -1)
-                    if res is not None:
-                        execL.append(res)
-                        if isinstance(res, str):
-                            execL.append("Str")
-                elif setting:
-                    if loc is not None:
-                        loc[e] = temp
-                    else:
-                        sym[e] = temp
-                    setting = False
-                else:
-                    value = loc[e] if (loc is not None and e in loc) else sym[e]
-                    if value is None:
-                        print(f"about to append None for variable {e!r}")
-                    execL.append(value)
-                    if isinstance(value, str):
-                        execL.append("Str")
-        if flag is not None:
-            flagStack.append(flag)
-        return ret
-    except Exception as inner:
-        raise _wrap_err(inner)
-
-
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: interpreter.py <script.tspmo>", file=sys.stderr)
-        sys.exit(1)
-
-    script_path = sys.argv[1]
-    exit_code   = run_file(script_path)
-    sys.exit(exit_code)
-
-
-if __name__ == "__main__":
-    main()
+#!/usr/bin/env python3
+
+import sys
+import os
+import re
+import hashlib
+import math
+import operator
+import pickle
+import glob
+import io
+import time
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
+import warnings
+import weakref
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+
+
+class TunRun(str):
+    """
+    A run of consecutive tun tokens collapsed by the lexer into one token, so
+    integer literals cost the same to lex and store whatever their value.
+    """
+
+    def __new__(cls, run):
+        self = super().__new__(cls, "tun")
+        self.run = run
+        return self
+
+    def text(self):
+        return " ".join(["tun"] * self.run)
+
+
+_token_re = re.compile(r"\S+")
+
+
+def _lex_stream(lines):
+    """
+    Tokens of an iterable of source lines, as (token, line number) pairs.
+    A run of tun is one TunRun at the line where it starts.
+    """
+    run = 0
+    for lineno, raw in enumerate(lines, start=1):
+        for m in _token_re.finditer(raw):
+            tok = m.group()
+            if tok == "tun":
+                if not run:
+                    first = lineno
+                run += 1
+                continue
+            if run:
+                yield (TunRun(run) if run > 1 else "tun"), first
+                run = 0
+            yield tok, lineno
+    if run:
+        yield (TunRun(run) if run > 1 else "tun"), first
+
+
+def _lex_with_lines(text: str):
+    # _lex_stream() into lists, inlined since whole-file compiles go through here
+    tokens = []
+    lines  = []
+    run = 0
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        for m in _token_re.finditer(raw):
+            tok = m.group()
+            if tok == "tun":
+                if not run:
+                    lines.append(lineno)
+                run += 1
+                continue
+            if run:
+                tokens.append(TunRun(run) if run > 1 else "tun")
+                run = 0
+            tokens.append(tok)
+            lines.append(lineno)
+    if run:
+        tokens.append(TunRun(run) if run > 1 else "tun")
+    return tokens, lines
+
+
+def _read_lines(path):
+    # the same lines as read_text().splitlines(), without holding the file
+    with open(path) as f:
+        for raw in f:
+            yield from raw.splitlines()
+
+
+def run_file(path: str) -> int:
+    return Interpreter().run_file(path)
+
+
+debug = False
+
+root = Path(__file__).resolve().parent
+stdlib_dir = root / "stdlib"
+if not stdlib_dir.is_dir():
+    stdlib_dir = root.parent / "stdlib"
+userlib_dir = root / "userlib"
+if not userlib_dir.is_dir():
+    userlib_dir = root.parent / "userlib"
+pmo_files = [p.name for p in stdlib_dir.glob("*.pmo") if p.is_file()]
+pmo_user_files = [p.name for p in userlib_dir.glob("*.pmo") if p.is_file()]
+stdlib = [Path(fn).stem for fn in pmo_files]
+userlib = [Path(fn).stem for fn in pmo_user_files]
+module_cache = {}
+use_disk_cache = True
+use_natives = True
+max_unary = 64
+max_depth = 1000000
+# yap output is collected and written out once this many characters are
+# pending (0 writes every line); plain_output prints values without trans()
+output_buffer = 1 << 16
+plain_output = False
+# results kept per LEBRON legoat function
+memo_size = 1 << 16
+# scripts this large run statement by statement as they are read
+stream_size = 1 << 26
+
+
+class TSPMOError(Exception):
+    pass
+
+
+class Function:
+    impl = None
+    pure = False
+
+    def __init__(self):
+        self.params = []
+        self.body = []
+        self.source = None
+        self.nlocals = 0
+
+
+class NativeFunction(Function):
+    """
+    A stdlib function with a Python implementation. The implementation returns
+    NotImplemented for arguments it does not cover, and the TSPMO body runs instead.
+    """
+
+    def __init__(self, fallback, impl):
+        super().__init__()
+        self.params = fallback.params
+        self.body = fallback.body
+        self.source = fallback.source
+        self.nlocals = fallback.nlocals
+        self.pure = fallback.pure
+        self.impl = impl
+
+
+class Memo:
+    """
+    Bounded LRU cache of one pure function's results, keyed by memo_key().
+    """
+
+    def __init__(self, size=None):
+        self.size = memo_size if size is None else size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.results[key]
+        except KeyError:
+            self.misses += 1
+            return _unset
+        self.results.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        # a cached list would be shared by every caller that gets it
+        if isinstance(value, list):
+            return
+        self.results[key] = value
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+
+def memo_key(args):
+    """
+    Cache key for a call, or None when an argument is unhashable. Types are
+    part of the key so sigma and 1 (or 1 and 1.0) are not mixed up.
+    """
+    key = (*args, *map(type, args))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _native_sort(x):
+    if not isinstance(x, list):
+        return NotImplemented
+    x.sort()
+    # the TSPMO body's last dih: whether its outer loop ran
+    return len(x) > 1
+
+
+def _native_popi(x, i):
+    if not isinstance(x, list) or type(i) is not int or not 0 <= i < len(x):
+        return NotImplemented
+    return x.pop(i)
+
+
+def _native_min(x):
+    if not isinstance(x, list) or not x:
+        return NotImplemented
+    return min(x)
+
+
+def _native_max(x):
+    if not isinstance(x, list) or not x:
+        return NotImplemented
+    return max(x)
+
+
+def _native_imean(x):
+    if not isinstance(x, list):
+        return NotImplemented
+    return sum(x) // len(x)
+
+
+def _native_fmean(x):
+    if not isinstance(x, list):
+        return NotImplemented
+    return sum(x) / len(x)
+
+
+def _native_pow(x, p):
+    if type(x) not in (int, float) or type(p) is not int or p < 0:
+        return NotImplemented
+    return x ** p if p else 1
+
+
+def _native_factorial(x):
+    if type(x) is not int:
+        return NotImplemented
+    return math.factorial(x) if x > 1 else 1
+
+
+def _native_gcd(x, y):
+    if type(x) is not int or type(y) is not int or x < 0 or y < 0:
+        return NotImplemented
+    return math.gcd(x, y)
+
+
+# Python fast paths for stdlib functions, by module and function name.
+natives = {
+    "list": {"sort": _native_sort, "popi": _native_popi, "min": _native_min, "max": _native_max,
+             "i.mean": _native_imean, "f.mean": _native_fmean},
+    "math": {"pow": _native_pow, "!": _native_factorial, "gcd": _native_gcd},
+}
+
+
+reserved = {"ts", "pmo", "rizz", "tun", "sahur", "sigma", "beta", "touch", "#shrink", "cavendish", "big25", "crockpot",
+            "chill", "grind", "L", "+", "-", "*", "/", "%", "or", "and", "not", "print", "yap", "set", "mogs", "vibes",
+            "hawk", "if", "lion", "then", "tiger", "else", "fr", "ong", "yo", "kid", "gurt", "legit", "bro", "sayong",
+            "spill", "chat?", "cond", "sybau", "GOAT", "LEBRON", "ngl", "legoat", "dih", "REF", "DO", "SOMETHING",
+            "stroke", "lowkey", "tf", "->", "<-", "bigf", "./", "ls", "gt", "ad", "rm", "[]", "get", "add", "remove",
+            "pt", "put", "girth", "BOOM", "len", "ret"}
+
+# Expression opcodes push and pop a frame's value stack. BINARY and UNARY carry
+# the Python function that implements the operator as their argument. The
+# statement opcodes from PRINT on take the finished statement's value
+# (stack[0]) and clear the stack, or move the program counter.
+# VAR and STORE name a global; LOCAL and STORE_LOCAL carry a slot in the
+# frame's locals, resolved by the parser.
+(CONST, VAR, LOCAL, LIST, BINARY, UNARY, PUT, CALL, TAILCALL,
+ PRINT, STORE, STORE_LOCAL, FLAG, RETURN, DISCARD, BRANCH, UNFLAG, JUMP, JUMP_FALSE, DEFINE, IMPORT) = range(21)
+op_names = ["const", "var", "local", "list", "binary", "unary", "put", "call", "tailcall",
+            "print", "store", "store_local", "flag", "return", "discard", "branch", "unflag", "jump",
+            "jump_false", "define", "import"]
+
+# an unassigned local slot; reads fall through to the global of that name
+_unset = object()
+statement_ops = {"yap": PRINT, "rizz": STORE, "hawk": FLAG, "dih": RETURN, "sybau": DISCARD, "pt": DISCARD}
+
+
+def _or(a, b):
+    return a or b
+
+
+def _and(a, b):
+    return a and b
+
+
+def _append(a, b):
+    return a.append(b)
+
+
+def _remove(a):
+    a.pop(-1)
+    return a
+
+
+def _split(a):
+    return a.split()
+
+
+def _input(prompt):
+    # the prompt has to come after everything yapped so far
+    for out in list(Output.live):
+        out.flush()
+    return input(prompt)
+
+
+binary_ops = {"touch": operator.add, "#shrink": operator.sub, "cavendish": operator.mul,
+              "big25": operator.floordiv, "bigf": operator.truediv, "crockpot": operator.mod,
+              "mogs": operator.gt, "vibes": operator.eq, "chill": _or, "grind": _and,
+              "stroke": operator.add, "ad": _append, "gt": operator.getitem}
+unary_ops = {"L": operator.not_, "sayong": bool, "spill": int, "lowkey": str, "tf": float,
+             "chat?": _input, "rm": _remove, "BOOM": _split, "girth": len}
+# operators with no side effects, which fold() may run at compile time
+pure_ops = {operator.add, operator.sub, operator.mul, operator.floordiv, operator.truediv,
+            operator.mod, operator.gt, operator.eq, _or, _and, operator.getitem,
+            operator.not_, bool, int, str, float, len}
+openers = {"yap", "rizz", "sybau", "hawk", "pt", "dih"}
+markers = {"lion", "tiger", "fr", "ong"}
+
+
+def _module_candidates(name):
+    # where a REF'd module is looked for, stdlib first
+    if not name or Path(name).name != name:
+        return ()
+    return stdlib_dir / f"{name}.pmo", userlib_dir / f"{name}.pmo"
+
+
+def _module_path(name):
+    # looked up on disk each time, so a module added while running is found
+    for path in _module_candidates(name):
+        if path.is_file():
+            return path
+    return None
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _stamp_or_none(path):
+    try:
+        return _stamp(path)
+    except OSError:
+        return None
+
+
+class Unit:
+    """
+    A compiled source file: its statements, the arities of every function it
+    can call, and the (mtime, size) stamps of the modules those came from.
+    A REF that did not resolve records its candidate paths with stamp None,
+    so the unit goes stale once the module appears.
+    """
+
+    def __init__(self, stamp, body, sigs, deps):
+        self.stamp = stamp
+        self.body = body
+        self.sigs = sigs
+        self.deps = deps
+
+    def fresh(self, stamp):
+        if stamp != self.stamp:
+            return False
+        return all(_stamp_or_none(p) == st for p, st in self.deps.items())
+
+
+def compile_file(path, active=None):
+    """
+    Compile a .tspmo/.pmo file, reusing the in-memory module_cache or the
+    on-disk __pmocache__ copy when the source and its REF'd modules are unchanged.
+    active holds the files whose compilation led here, to stop on REF cycles.
+    """
+    path = Path(path).resolve()
+    stamp = _stamp(path)
+    unit = module_cache.get(path)
+    if unit is not None and unit.fresh(stamp):
+        return unit
+    unit = _read_cache(path, stamp)
+    if unit is None:
+        tokens, lines = _lex_with_lines(path.read_text())
+        parser = Parser(tokens, lines, active=(active or frozenset()) | {path}, source=str(path))
+        unit = Unit(stamp, assemble(parser.parse()), parser.sigs, parser.deps)
+        _write_cache(path, unit)
+    module_cache[path] = unit
+    return unit
+
+
+def _skip_comments(pairs, problems=None):
+    pairs = iter(pairs)
+    for tok, line in pairs:
+        if tok == "->":
+            for tok, _ in pairs:
+                if tok == "<-":
+                    break
+            else:
+                msg = "Comment opened with -> is never closed with <-"
+                if problems is None:
+                    raise TSPMOError(f"Line {line}: {msg}")
+                problems.append((line, msg))
+            continue
+        yield tok, line
+
+
+def _strip_comments(tokens, lines, problems=None):
+    # _skip_comments() over whole lists, by index since this is the hot path
+    out = []
+    out_lines = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "->":
+            j = i + 1
+            while j < len(tokens) and tokens[j] != "<-":
+                j += 1
+            if j == len(tokens):
+                msg = "Comment opened with -> is never closed with <-"
+                if problems is None:
+                    raise TSPMOError(f"Line {lines[i]}: {msg}")
+                problems.append((lines[i], msg))
+            i = j + 1
+            continue
+        out.append(tokens[i])
+        out_lines.append(lines[i])
+        i += 1
+    return out, out_lines
+
+
+def _top_level(pairs):
+    """
+    Group a comment-free token stream into top-level statements, as
+    (tokens, lines) pairs: ts ... pmo including a kid's whole block,
+    LEBRON ... GOAT, or REF ... SOMETHING. Any other token is passed on by
+    itself for the parser to reject. A broken statement runs on until
+    something closes it, so the parser reports the same error as for the
+    whole file.
+    """
+    tokens, lines = [], []
+    depth = 0
+    quoted = False
+    prev = None
+    for tok, line in pairs:
+        tokens.append(tok)
+        lines.append(line)
+        if quoted:
+            quoted = tok != "bro"
+        elif tok == "legit":
+            quoted = True
+        elif tok == "LEBRON" or prev == "ts" and tok == "kid":
+            depth += 1
+        elif depth and (tok == "GOAT" or prev == "ts" and tok == "gurt"):
+            depth -= 1
+        prev = tok
+        head = tokens[0]
+        if head == "ts":
+            done = tok == "pmo" and not depth and not quoted
+        elif head == "LEBRON":
+            done = not depth
+        elif head == "REF":
+            done = len(tokens) > 2 and tokens[-2] == "DO"
+        else:
+            done = True
+        if done:
+            yield tokens, lines
+            tokens, lines = [], []
+            prev = None
+    if tokens:
+        yield tokens, lines
+
+
+class Stmt:
+    __slots__ = ("kind", "line", "code", "arg")
+
+    def __init__(self, kind, line, arg=None):
+        self.kind = kind
+        self.line = line
+        self.code = ()
+        self.arg = arg
+
+
+class Code:
+    """
+    A block of statements assembled into one flat list of (op, arg)
+    instructions. lines[pc] is the source line of instruction pc, and marks
+    maps the first instruction of each statement to its (line, kind).
+    """
+    __slots__ = ("ops", "lines", "marks")
+
+    def __init__(self):
+        self.ops = []
+        self.lines = []
+        self.marks = {}
+
+    def emit(self, op, arg, line):
+        self.ops.append((op, arg))
+        self.lines.append(line)
+        return len(self.ops) - 1
+
+
+def _repeat_length(a, b):
+    # length of a str repeated by an int, in either order, and 0 otherwise
+    if isinstance(a, int) and isinstance(b, str):
+        a, b = b, a
+    if isinstance(a, str) and isinstance(b, int):
+        return len(a) * b
+    return 0
+
+
+def fold(ops):
+    """
+    Constant-fold postfix expression code: a pure BINARY or UNARY whose
+    operands are all CONST becomes one CONST. Anything that raises, or gives a
+    mutable or very long value, is left for run time.
+    """
+    out = []
+    for op, arg in ops:
+        if op == BINARY and arg in pure_ops and len(out) > 1 and out[-1][0] == CONST and out[-2][0] == CONST:
+            operands = (out[-1][1], out[-2][1])
+        elif op == UNARY and arg in pure_ops and out and out[-1][0] == CONST:
+            operands = (out[-1][1],)
+        else:
+            out.append((op, arg))
+            continue
+        if arg is operator.mul and _repeat_length(*operands) > 4096:
+            # known from the operands; building it could take gigabytes
+            out.append((op, arg))
+            continue
+        try:
+            value = arg(*operands)
+        except Exception:
+            out.append((op, arg))
+            continue
+        if not isinstance(value, (int, float, str)) or isinstance(value, str) and len(value) > 4096:
+            out.append((op, arg))
+            continue
+        del out[-len(operands):]
+        out.append((CONST, value))
+    return out
+
+
+def assemble(body, in_function=False):
+    """
+    Lower parsed statements to a Code. kid loops become a condition and
+    JUMP_FALSE around the body, each lion/tiger jumps straight to the fr that
+    closes it, matched by nesting, and function bodies are assembled in turn.
+
+    Expressions go through fold() first. A sybau of a constant is dropped,
+    and after a hawk on a constant, lion/tiger become a JUMP or nothing
+    until something else could change the flag.
+    """
+    code = Code()
+    _assemble_block(code, body, in_function)
+    return code
+
+
+def _merge_known(a, b):
+    # flag values that hold on both of two paths meeting at a fr
+    if len(a) != len(b):
+        return [None] * len(b)
+    return [x if x == y else None for x, y in zip(a, b)]
+
+
+def _assemble_block(code, body, in_function):
+    # known has one entry per hawk still open in this block, innermost last:
+    # the value of its flag when that is fixed at compile time, and None
+    # otherwise. Flags belong to the running frame, so calls cannot change
+    # them. branches holds (at, want, flag, known) for each lion/tiger
+    # waiting for its fr, innermost last; a fr closes the innermost one.
+    # at is its BRANCH, or None when the branch always runs, flag is the
+    # tested flag when known, and known is a copy as the branch was reached.
+    known = [None]
+    branches = []
+    for s in body:
+        kind = s.kind
+        ops = fold(s.code)
+        if kind == "sybau" and all(op == CONST for op, _ in ops):
+            continue
+        code.marks[len(code.ops)] = (s.line, kind)
+        if kind == "lion" or kind == "tiger":
+            want = kind == "lion"
+            flag = known[-1]
+            # a branch whose flag is known to differ becomes a JUMP at its fr
+            at = code.emit(BRANCH, (want, None), s.line) if flag != want else None
+            branches.append((at, want, flag, list(known)))
+        elif kind == "fr":
+            if not branches:
+                continue
+            at, want, flag, before = branches.pop()
+            if at is not None:
+                code.ops[at] = (BRANCH, (want, len(code.ops))) if flag is None else (JUMP, len(code.ops))
+            if flag is None:
+                # the branch may or may not have run, and its body may
+                # have pushed or popped flags
+                known = _merge_known(before, known)
+            elif flag != want:
+                # the body never runs
+                known = before
+        elif kind == "ong":
+            code.emit(UNFLAG, None, s.line)
+            if len(known) > 1:
+                known.pop()
+            else:
+                # pops a flag from an enclosing block
+                known[0] = None
+        elif kind == "kid":
+            cond, loop_body = s.arg
+            top = len(code.ops)
+            for op, arg in fold(cond):
+                code.emit(op, arg, s.line)
+            exit_at = code.emit(JUMP_FALSE, None, s.line)
+            _assemble_block(code, loop_body, in_function)
+            code.emit(JUMP, top, s.line)
+            code.ops[exit_at] = (JUMP_FALSE, len(code.ops))
+            # the body may leave flags pushed or popped
+            known = [None] * len(known)
+        elif kind == "LEBRON":
+            name, f = s.arg
+            f.body = assemble(f.body, True)
+            code.emit(DEFINE, (name, f), s.line)
+        elif kind == "REF":
+            code.emit(IMPORT, s.arg, s.line)
+        else:
+            if kind == "dih" and in_function and ops[-1][0] == CALL:
+                # may become a tail call; decided at run time by _in_tail
+                ops = ops[:-1] + [(TAILCALL, ops[-1][1])]
+            for op, arg in ops:
+                code.emit(op, arg, s.line)
+            if kind == "rizz":
+                code.emit(STORE_LOCAL if in_function else STORE, s.arg, s.line)
+            else:
+                code.emit(statement_ops[kind], None, s.line)
+            if kind == "hawk":
+                known.append(bool(ops[0][1]) if len(ops) == 1 and ops[0][0] == CONST else None)
+
+
+def _in_tail(ops, pc, flags):
+    """
+    Whether a dih call whose RETURN is at pc-1 is in tail position: only ong
+    and lion/tiger branches (or the jumps they were simplified to) can still
+    run in this frame, and they only touch its own flags, so the frame can
+    be dropped. Following the branches needs the frame's flags as they are.
+    """
+    pops = 0
+    n = len(ops)
+    while pc < n:
+        op, arg = ops[pc]
+        if op == UNFLAG and pops < len(flags):
+            pops += 1
+            pc += 1
+        elif op == JUMP and arg > pc:
+            pc = arg
+        elif op == BRANCH and pops < len(flags):
+            want, target = arg
+            if bool(flags[-1 - pops]) == want:
+                pc += 1
+            elif target is not None:
+                pc = target
+            else:
+                return False
+        else:
+            return False
+    return True
+
+
+class Parser:
+    """
+    Compile a token stream into a list of statements. Expressions are stored as
+    postfix (op, arg) code, with operands evaluated right to left.
+
+    With check=True the parser does not load REF'd modules and does not stop
+    at the first error: each one is recorded in problems as (position, message),
+    where position is the token's entry in line_map, and parsing resumes at the
+    next statement.
+    """
+
+    def __init__(self, tokens, line_map=None, local_names=None, active=frozenset(), check=False, source=None):
+        if line_map is None:
+            line_map = [1] * len(tokens)
+        self.problems = [] if check else None
+        self.tokens, self.lines = _strip_comments(tokens, line_map, self.problems)
+        self.i = 0
+        self.stmt = None
+        self.local_names = local_names
+        self.conds = []
+        self.global_names = set()
+        self.sigs = {}
+        self.deps = {}
+        self.active = active
+        self.source = source
+        self._scan_signatures(self.tokens)
+
+    def _err(self, msg, i=None):
+        if i is None:
+            i = self.i
+        if not self.lines:
+            ln = -1
+        else:
+            ln = self.lines[min(max(i, 0), len(self.lines) - 1)]
+        if self.problems is not None:
+            self.problems.append((ln, msg))
+            raise TSPMOError(msg)
+        raise TSPMOError(f"Line {ln}: {msg}")
+
+    def _recover(self, start):
+        # Resume after the pmo closing the broken statement, or at the next
+        # token that can only begin or end a statement.
+        self.i = max(self.i, start + 1)
+        while self.i < len(self.tokens):
+            c = self.tokens[self.i]
+            if c == "pmo":
+                self.i += 1
+                return
+            if c in ("ts", "LEBRON", "GOAT"):
+                return
+            self.i += 1
+
+    def _next(self):
+        if self.i >= len(self.tokens):
+            if self.stmt is not None:
+                self._err("ts is never closed with pmo", self.stmt)
+            self._err("Unexpected end of file")
+        c = self.tokens[self.i]
+        self.i += 1
+        return c
+
+    def _peek(self, k=0):
+        if self.i + k < len(self.tokens):
+            return self.tokens[self.i + k]
+        return None
+
+    def _expect(self, tok):
+        if self._next() != tok:
+            self._err(f"{tok} expected", self.i - 1)
+
+    def _scan_signatures(self, tokens):
+        # Calls consume a fixed number of arguments, so arities of every function
+        # reachable from this unit (including REF'd modules) are needed up front.
+        # tokens may be a one-pass iterator.
+        tokens = iter(tokens)
+        for tok in tokens:
+            if tok == "LEBRON":
+                name = next(tokens, None)
+                if name == "legoat":
+                    name = next(tokens, None)
+                if name is None:
+                    break
+                arity = 0
+                for tok in tokens:
+                    if tok == "ngl":
+                        break
+                    arity += 1
+                self.sigs[name] = arity
+            elif tok == "REF":
+                for tok in tokens:
+                    if tok == "DO":
+                        break
+                    if self.problems is not None:
+                        continue
+                    name = tok.replace(",", "")
+                    path = _module_path(name)
+                    if path is None:
+                        for candidate in _module_candidates(name):
+                            self.deps[str(candidate.resolve())] = None
+                    elif path.resolve() not in self.active:
+                        unit = compile_file(path, self.active)
+                        self.sigs.update(unit.sigs)
+                        self.deps[str(path.resolve())] = unit.stamp
+                        self.deps.update(unit.deps)
+
+    def _assigned_names(self):
+        names = set()
+        j = self.i
+        while j < len(self.tokens) and self.tokens[j] != "GOAT":
+            if self.tokens[j] == "rizz" and j + 1 < len(self.tokens):
+                names.add(self.tokens[j + 1])
+            j += 1
+        return names
+
+    def parse(self):
+        return self._block()
+
+    def parse_stream(self, statements):
+        """
+        Parse the (tokens, lines) statements from _top_level() and yield them
+        in runnable lists. A list is only cut where no lion/tiger is waiting
+        for its fr, since a branch jumps forward within one assembled Code.
+        """
+        self.conds.append(None)
+        body = []
+        # lion/tiger still open, each closed by one fr as in _assemble_block()
+        waiting = 0
+        for self.tokens, self.lines in statements:
+            self.i = 0
+            while self.i < len(self.tokens):
+                self.stmt = None
+                s = self._statement()
+                body.append(s)
+                if s.kind == "lion" or s.kind == "tiger":
+                    waiting += 1
+                elif s.kind == "fr" and waiting:
+                    waiting -= 1
+            if not waiting:
+                yield body
+                body = []
+        if body:
+            yield body
+
+    def _block(self, end=None, opened_at=None):
+        body = []
+        # Each block remembers its latest yo statement; a kid loops on the
+        # nearest one, looking outwards through enclosing blocks.
+        self.conds.append(None)
+        try:
+            while self.i < len(self.tokens):
+                c = self.tokens[self.i]
+                self.stmt = None
+                if end == "GOAT" and c == "GOAT":
+                    self.i += 1
+                    return body
+                if end == "gurt" and c == "ts" and self._peek(1) == "gurt":
+                    self.i += 2
+                    self._expect("pmo")
+                    return body
+                if end == "gurt" and c == "GOAT":
+                    break
+                start = self.i
+                try:
+                    body.append(self._statement())
+                except TSPMOError:
+                    if self.problems is None:
+                        raise
+                    self._recover(start)
+            if end == "GOAT":
+                self._err("Function is never closed with GOAT", opened_at)
+            elif end == "gurt":
+                self._err("kid is never closed with gurt", opened_at)
+            return body
+        finally:
+            self.conds.pop()
+
+    def _statement(self):
+        start = self.i
+        line = self.lines[start]
+        c = self._next()
+        if c == "LEBRON":
+            return self._function(line, start)
+        elif c == "REF":
+            return self._import(line)
+        elif c != "ts":
+            self._err(f"Commands must start with ts or LEBRON {c}", start)
+        self.stmt = start
+
+        c = self._next()
+        if c in markers:
+            self._expect("pmo")
+            return Stmt(c, line)
+        elif c == "kid":
+            self._expect("pmo")
+            cond = next((code for code in reversed(self.conds) if code is not None), None)
+            if cond is None:
+                self._err("kid has no loop condition. End a statement with yo before it", start)
+            return Stmt("kid", line, arg=(cond, self._block("gurt", start)))
+        elif c == "rizz":
+            target = self._next()
+            if target in reserved:
+                self._err(f"{target} is reserved by the language", self.i - 1)
+            if self.local_names is not None:
+                s = Stmt("rizz", line, arg=self.local_names.setdefault(target, len(self.local_names)))
+            else:
+                self.global_names.add(target)
+                s = Stmt("rizz", line, arg=target)
+        elif c in openers:
+            s = Stmt(c, line)
+        else:
+            self._err(f"Assignment or Function Expected {c}", self.i - 1)
+
+        if c == "pt":
+            exprs = [self._operands(3) + [(PUT, None)]]
+        else:
+            exprs = [self._expr()]
+        while True:
+            c = self._peek()
+            if c == "pmo":
+                self.i += 1
+                break
+            elif c == "yo":
+                self.i += 1
+                self._expect("pmo")
+                s.code = [op for e in reversed(exprs) for op in e]
+                self.conds[-1] = s.code
+                return s
+            elif c is None or c in ("ts", "LEBRON", "GOAT"):
+                self._err("ts is never closed with pmo", start)
+            exprs.append(self._expr())
+        s.code = [op for e in reversed(exprs) for op in e]
+        return s
+
+    def _function(self, line, start):
+        name = self._next()
+        f = Function()
+        f.source = self.source
+        if name == "legoat":
+            # LEBRON legoat name ...: results are cached by argument values
+            f.pure = True
+            name = self._next()
+        while self._peek() != "ngl":
+            if self._peek() is None:
+                self._err("LEBRON is never followed by ngl", start)
+            f.params.append(self._next())
+        self.i += 1
+        outer = self.local_names, self.conds
+        # parameters take the first slots so call arguments land in place
+        self.local_names = {p: i for i, p in enumerate(f.params)}
+        for n in sorted(self._assigned_names()):
+            self.local_names.setdefault(n, len(self.local_names))
+        self.conds = []
+        try:
+            f.body = self._block("GOAT", start)
+            f.nlocals = len(self.local_names)
+        finally:
+            self.local_names, self.conds = outer
+        return Stmt("LEBRON", line, arg=(name, f))
+
+    def _import(self, line):
+        names = []
+        c = self._next()
+        while c != "DO":
+            c = c.replace(",", "")
+            if c:
+                names.append(c)
+            c = self._next()
+        if self._next() != "SOMETHING":
+            self._err("Failed to correctly import modules. Are you closing with DO SOMETHING?", self.i - 1)
+        return Stmt("REF", line, arg=names)
+
+    def _operands(self, n):
+        exprs = [self._expr() for _ in range(n)]
+        return [op for e in reversed(exprs) for op in e]
+
+    def _expr(self):
+        """
+        One prefix expression as postfix code, parsed with an explicit stack
+        so operator chains can be as long as generated code makes them. Every
+        token gives one op, and reversing the ops in source order puts each
+        operator after its operands, last operand first.
+        """
+        ops = []
+        # per open operator: [operands still wanted], or for a call
+        # [arguments still wanted, index of its CALL in ops, name, arg specs]
+        todo = []
+        while True:
+            c = self._next()
+            if c in binary_ops:
+                ops.append((BINARY, binary_ops[c]))
+                todo.append([2])
+                continue
+            elif c in unary_ops:
+                ops.append((UNARY, unary_ops[c]))
+                todo.append([1])
+                continue
+            done = True
+            if c == "tun":
+                cval = getattr(c, "run", 1) - 1
+                c = self._next()
+                while c == "tun":
+                    cval += getattr(c, "run", 1)
+                    c = self._next()
+                if c != "sahur":
+                    self._err("Int Interrupt", self.i - 1)
+                ops.append((CONST, cval))
+            elif c == "legit":
+                start = self.i - 1
+                parts = []
+                while self._peek() != "bro":
+                    if self._peek() is None:
+                        self._err("legit is never closed with bro", start)
+                    c = self._next()
+                    parts.append(c.text() if isinstance(c, TunRun) else c)
+                self.i += 1
+                ops.append((CONST, " ".join(parts)))
+            elif c == "sigma":
+                ops.append((CONST, True))
+            elif c == "beta":
+                ops.append((CONST, False))
+            elif c == "ls":
+                ops.append((LIST, None))
+            elif self.local_names is not None and c in self.local_names:
+                ops.append((LOCAL, (self.local_names[c], c)))
+            elif c in self.sigs and c not in self.global_names:
+                # before reserved: a function may be named like add or len
+                ops.append(None)
+                todo.append([self.sigs[c], len(ops) - 1, c, []])
+                done = False
+            elif c in reserved:
+                self._err(f"Not a valid Expression {c}", self.i - 1)
+            else:
+                ops.append((VAR, c))
+            # close every operator and call that this operand completes
+            while todo:
+                t = todo[-1]
+                if done:
+                    t[0] -= 1
+                if len(t) > 1:
+                    if self._call_args(t):
+                        break
+                    ops[t[1]] = (CALL, (t[2], tuple(t[3])))
+                elif t[0]:
+                    break
+                todo.pop()
+                done = True
+            if not todo:
+                ops.reverse()
+                return ops
+
+    def _call_args(self, t):
+        """
+        Take a call's arguments up to the next one that is an expression.
+        Digit strings and plain names are resolved by the CALL itself; an
+        expression argument's spec (None, None) takes its value off the stack.
+        Returns whether an expression argument comes next.
+        """
+        left, _, _, args = t
+        while left:
+            a = self._peek()
+            if a is not None and a.isdigit():
+                args.append((CONST, int(a)))
+            elif self.local_names is not None and a in self.local_names:
+                args.append((LOCAL, (self.local_names[a], a)))
+            elif a is None or a in reserved or a in self.sigs and a not in self.global_names:
+                args.append((None, None))
+                t[0] = left
+                return True
+            else:
+                args.append((VAR, a))
+            self.i += 1
+            left -= 1
+        t[0] = 0
+        return False
+
+
+def check_tokens(tokens, positions):
+    """
+    Structural errors in a token stream as (position, message) pairs, without
+    compiling anything it imports. Runs in time linear in the token count.
+    """
+    parser = Parser(tokens, positions, check=True)
+    parser.parse()
+    return parser.problems
+
+
+def trans(value):
+    if isinstance(value, bool) and not (value is 1 or value is 0):
+        return "sigma" if value else "beta"
+    elif isinstance(value, int):
+        if 0 <= value < max_unary:
+            return (value + 1) * "tun " + "sahur"
+        return f"spill legit {value} bro"
+    elif isinstance(value, str):
+        return "legit " + value + " bro"
+    elif isinstance(value, float):
+        return "ts tf " + str(value)
+    elif isinstance(value, list):
+        return "ls " + str(value)
+
+
+class Output:
+    """
+    Buffered writer for yap. Text is joined and written to sys.stdout (looked
+    up at flush time, so redirect_stdout applies) once limit characters are
+    pending, and whenever flush() is called.
+    """
+    live = weakref.WeakSet()
+
+    def __init__(self, limit=None):
+        self.limit = output_buffer if limit is None else limit
+        self.parts = []
+        self.size = 0
+        Output.live.add(self)
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            sys.stdout.write("".join(self.parts))
+            self.parts = []
+            self.size = 0
+        sys.stdout.flush()
+
+
+class Interpreter:
+    """
+    Everything a running TSPMO program can change: globals, functions and
+    loaded modules. hawk flags live in run_code's frames. Instances share
+    nothing but the compiled code in module_cache, so they can run side by
+    side in threads. preload() warms an instance up with modules that every
+    later run_file() starts from.
+    """
+
+    def __init__(self):
+        self.debug = debug
+        self.use_natives = use_natives
+        self.plain_output = plain_output
+        self.output = Output()
+        self.sym = {}
+        self.funcs = {}
+        self.loaded = set()
+        self.loading = []
+        self.profiler = None
+        self.memos = {}
+        self._base = ({}, {}, set())
+
+    def preload(self, *names):
+        for name in names:
+            self.load_module(name)
+        self._base = (dict(self.sym), dict(self.funcs), set(self.loaded))
+
+    def reset(self):
+        sym, funcs, loaded = self._base
+        self.sym = dict(sym)
+        self.funcs = dict(funcs)
+        self.loaded = set(loaded)
+        self.loading = []
+        self.memos = {}
+
+    def run_file(self, path: str) -> int:
+        prof = self.profiler
+        try:
+            streamed = os.path.getsize(path) >= stream_size
+            unit = None if streamed else compile_file(path)
+            self.reset()
+            if prof is not None:
+                prof.enter("<main>", str(Path(path).resolve()))
+            try:
+                if streamed:
+                    self.stream_file(path)
+                else:
+                    self.run_code(unit.body)
+            finally:
+                self.output.flush()
+                if prof is not None:
+                    prof.leave()
+            return 0
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    def stream_file(self, path):
+        """
+        Run a script while reading it. A first pass over the file collects
+        function arities, then each top-level statement is compiled and run
+        once it is complete, so memory stays near the size of one statement.
+        Statements before a syntax error have already run when it is found,
+        and nothing is cached.
+        """
+        path = Path(path).resolve()
+        parser = Parser([], active=frozenset({path}), source=str(path))
+        parser._scan_signatures(tok for tok, _ in _skip_comments(_lex_stream(_read_lines(path))))
+        flags = []
+        for body in parser.parse_stream(_top_level(_skip_comments(_lex_stream(_read_lines(path))))):
+            self.run_code(assemble(body), flags=flags)
+
+    def run_source(self, text):
+        tokens, lines = _lex_with_lines(text)
+        try:
+            return self.run_code(assemble(Parser(tokens, lines).parse()))
+        finally:
+            self.output.flush()
+
+    def load_module(self, name):
+        path = _module_path(name)
+        if path is None:
+            raise Exception(f"Failed to load module {name}. It is either missing from the stdlib, or you forgot to add it to userlib.")
+        if path in self.loaded:
+            return
+        if name in self.loading:
+            cycle = " -> ".join(self.loading[self.loading.index(name):] + [name])
+            raise Exception(f"Import cycle between modules: {cycle}")
+        self.loading.append(name)
+        prof = self.profiler
+        if prof is not None:
+            prof.enter(f"<{name}>", str(path))
+        try:
+            self.run_code(compile_file(path).body)
+        finally:
+            self.loading.pop()
+            if prof is not None:
+                prof.leave()
+        self.loaded.add(path)
+        if self.use_natives and path.parent == stdlib_dir:
+            for fname, impl in natives.get(name, {}).items():
+                if fname in self.funcs:
+                    self.funcs[fname] = NativeFunction(self.funcs[fname], impl)
+
+    def _memo(self, f):
+        memo = self.memos.get(f)
+        if memo is None:
+            memo = self.memos[f] = Memo()
+        return memo
+
+    def memo_report(self, file=sys.stderr):
+        print(f"{'memoized':<24}{'hits':>10}{'misses':>10}{'cached':>10}", file=file)
+        for f, memo in self.memos.items():
+            name = next((n for n, g in self.funcs.items() if g is f), "?")
+            print(f"{name:<24}{memo.hits:>10}{memo.misses:>10}{len(memo.results):>10}", file=file)
+
+    def run_code(self, code, loc=None, flags=None):
+        """
+        Run an assembled block and return its dih value. TSPMO calls push a
+        frame onto an explicit stack instead of recursing in Python, and a
+        call in tail position reuses the caller's frame. loc is the list of
+        local slots when running a function body. Every frame has its own
+        hawk flags; flags passes in the list for the outermost one. A frame's
+        pending holds the (Memo, key) pairs that get its result when it
+        returns.
+        """
+        frames = []
+        cur, pc, stack, r, fname, pending = code, 0, [], None, None, None
+        if flags is None:
+            flags = []
+        ops, n = cur.ops, len(cur.ops)
+        sym, funcs = self.sym, self.funcs
+        prof = self.profiler
+        traced = self.debug or prof is not None
+        handlers = _handlers
+        try:
+            while True:
+                if pc == n:
+                    # end of a frame: hand r to the caller
+                    if pending is not None:
+                        for memo, key in pending:
+                            memo.put(key, r)
+                    if not frames:
+                        return r
+                    if prof is not None:
+                        prof.leave()
+                    result = r
+                    cur, pc, stack, loc, r, flags, fname, pending = frames.pop()
+                    ops, n = cur.ops, len(cur.ops)
+                    stack.append(result)
+                    continue
+                op, arg = ops[pc]
+                if traced:
+                    self._trace(cur, pc, stack)
+                pc += 1
+
+                if op == LOCAL:
+                    value = loc[arg[0]]
+                    if value is _unset:
+                        # not assigned yet in this call, so the global is visible
+                        if arg[1] not in sym:
+                            raise Exception(f"Unknown variable {arg[1]}")
+                        value = sym[arg[1]]
+                    stack.append(value)
+                elif op == VAR:
+                    if arg in sym:
+                        stack.append(sym[arg])
+                    else:
+                        raise Exception(f"Unknown variable {arg}")
+                elif op == CONST:
+                    stack.append(arg)
+                elif op == BINARY:
+                    a = stack.pop()
+                    stack[-1] = arg(a, stack[-1])
+                elif handlers[op] is not None:
+                    # a handler returns the pc to jump to, if any
+                    target = handlers[op](self, stack, arg, loc, flags)
+                    if target is not None:
+                        pc = target
+                elif op == RETURN:
+                    value = stack[0] if stack else None
+                    stack.clear()
+                    if value is not None:
+                        r = value
+                else:
+                    # CALL and TAILCALL switch frames, so they stay inline
+                    callee, raw_args = arg
+                    f = funcs.get(callee)
+                    if f is None:
+                        raise Exception(f"Unknown function {callee}")
+                    args = []
+                    for kind, a in raw_args:
+                        if kind == CONST:
+                            args.append(a)
+                            continue
+                        if kind is None:
+                            args.append(stack.pop())
+                            continue
+                        if kind == LOCAL:
+                            value = loc[a[0]]
+                            if value is not _unset:
+                                args.append(value)
+                                continue
+                            a = a[1]
+                        if a not in sym:
+                            raise Exception(f"Unknown argument {a!r} for function {callee}")
+                        args.append(sym[a])
+                    if len(args) != len(f.params):
+                        raise Exception(f"Args bad in function with params {f.params}")
+                    if f.impl is not None:
+                        if prof is None:
+                            res = f.impl(*args)
+                        else:
+                            prof.enter(callee, f.source)
+                            try:
+                                res = f.impl(*args)
+                            finally:
+                                prof.leave()
+                        if res is not NotImplemented:
+                            stack.append(res)
+                            continue
+                    waiting = None
+                    if f.pure:
+                        key = memo_key(args)
+                        if key is not None:
+                            memo = self._memo(f)
+                            res = memo.get(key)
+                            if res is not _unset:
+                                stack.append(res)
+                                continue
+                            waiting = [(memo, key)]
+                    if f.nlocals > len(args):
+                        args += [_unset] * (f.nlocals - len(args))
+                    # a tail call would carry the caller's r, so a call that
+                    # waits for its own result always gets a frame
+                    if op == TAILCALL and not stack and waiting is None:
+                        if _in_tail(ops, pc + 1, flags):
+                            if prof is not None:
+                                prof.leave()
+                                prof.enter(callee, f.source)
+                            # the rest of this frame only touches its own flags
+                            cur, pc, loc, flags, fname = f.body, 0, args, [], callee
+                            ops, n = cur.ops, len(cur.ops)
+                            continue
+                    if len(frames) >= max_depth:
+                        raise Exception(f"Call stack deeper than {max_depth} calls")
+                    frames.append((cur, pc, stack, loc, r, flags, fname, pending))
+                    if prof is not None:
+                        prof.enter(callee, f.source)
+                    cur, pc, stack, loc, r, flags, fname, pending = f.body, 0, [], args, None, [], callee, waiting
+                    ops, n = cur.ops, len(cur.ops)
+        except Exception as e:
+            if prof is not None:
+                for _ in range(len(frames)):
+                    prof.leave()
+            if isinstance(e, TSPMOError):
+                raise
+            raise TSPMOError(f"Line {cur.lines[pc - 1]}: {e}")
+
+    def _trace(self, code, pc, stack):
+        if self.debug:
+            self.output.flush()
+        mark = code.marks.get(pc)
+        if mark is not None:
+            if self.profiler is not None:
+                self.profiler.hit(mark[0])
+            if self.debug:
+                print("exec", *mark)
+        if self.debug:
+            op, arg = code.ops[pc]
+            print(op_names[op], arg, stack)
+
+
+# One handler per opcode that only touches the operand stack, the variables
+# and the frame's flags, called as handler(interp, stack, arg, loc, flags).
+# Jumps return their target pc. run_code runs the rest inline: RETURN, CALL
+# and TAILCALL change the frame's own registers, and LOCAL, VAR, CONST and
+# BINARY, most of all ops run, are tested before the table lookup because a
+# comparison is cheaper than a call (bench/bench_ops.py).
+
+def _op_list(interp, stack, arg, loc, flags):
+    stack.append([])
+
+
+def _op_unary(interp, stack, arg, loc, flags):
+    stack[-1] = arg(stack[-1])
+
+
+def _op_put(interp, stack, arg, loc, flags):
+    arr = stack.pop()
+    ind = stack.pop()
+    arr[ind] = stack[-1]
+
+
+def _op_print(interp, stack, arg, loc, flags):
+    value = stack[0] if stack else None
+    stack.clear()
+    interp.output.write(f"{value}\n" if interp.plain_output else f"{trans(value)} ({value})\n")
+
+
+def _op_store(interp, stack, arg, loc, flags):
+    interp.sym[arg] = stack[0] if stack else None
+    stack.clear()
+
+
+def _op_store_local(interp, stack, arg, loc, flags):
+    loc[arg] = stack[0] if stack else None
+    stack.clear()
+
+
+def _op_flag(interp, stack, arg, loc, flags):
+    flags.append(bool(stack[0] if stack else None))
+    stack.clear()
+
+
+def _op_discard(interp, stack, arg, loc, flags):
+    stack.clear()
+
+
+def _op_branch(interp, stack, arg, loc, flags):
+    want, target = arg
+    if not flags:
+        raise Exception(f"{'lion' if want else 'tiger'} has no hawk to test")
+    if bool(flags[-1]) != want:
+        if target is None:
+            raise Exception(f"{'lion' if want else 'tiger'} branch is never closed with fr")
+        return target
+
+
+def _op_unflag(interp, stack, arg, loc, flags):
+    if not flags:
+        raise Exception("ong has no hawk to pop")
+    flags.pop()
+
+
+def _op_jump(interp, stack, arg, loc, flags):
+    return arg
+
+
+def _op_jump_false(interp, stack, arg, loc, flags):
+    value = stack[0] if stack else None
+    stack.clear()
+    if not value:
+        return arg
+
+
+def _op_define(interp, stack, arg, loc, flags):
+    interp.funcs[arg[0]] = arg[1]
+
+
+def _op_import(interp, stack, arg, loc, flags):
+    for name in arg:
+        interp.load_module(name)
+
+
+_handlers = [None, None, None, _op_list, None, _op_unary, _op_put, None, None,
+             _op_print, _op_store, _op_store_local, _op_flag, None, _op_discard, _op_branch,
+             _op_unflag, _op_jump, _op_jump_false, _op_define, _op_import]
+
+
+class Profiler:
+    """
+    Per-function call counts with inclusive and exclusive time, and hit counts
+    per source line, recorded by an Interpreter whose profiler is set. Module
+    bodies and the script itself count as the frames <name> and <main>.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.inclusive = defaultdict(float)
+        self.exclusive = defaultdict(float)
+        self.hits = Counter()
+        self.stacks = defaultdict(float)   # exclusive time by stack id
+        self.frames = []    # [name, source, start, time spent in callees, stack id]
+        self.open = Counter()
+        # stack ids are interned (parent id, name) pairs, so entering a frame
+        # costs the same at any depth. A function already on the stack goes
+        # back to the id of its outermost frame: recursion folds into one
+        # stack instead of one per depth.
+        self._ids = {}
+        self._parents = [(None, None)]     # id 0 is the empty stack
+        self._outermost = {}
+
+    def enter(self, name, source):
+        self.calls[name] += 1
+        self.open[name] += 1
+        if self.open[name] > 1:
+            sid = self._outermost[name]
+        else:
+            key = (self.frames[-1][4] if self.frames else 0, name)
+            sid = self._ids.get(key)
+            if sid is None:
+                sid = self._ids[key] = len(self._parents)
+                self._parents.append(key)
+            self._outermost[name] = sid
+        self.frames.append([name, source, time.perf_counter(), 0.0, sid])
+
+    def leave(self):
+        name, _, start, inner, sid = self.frames.pop()
+        spent = time.perf_counter() - start
+        self.open[name] -= 1
+        if not self.open[name]:
+            # only the outermost of recursive frames counts towards inclusive time
+            self.inclusive[name] += spent
+        self.exclusive[name] += spent - inner
+        self.stacks[sid] += spent - inner
+        if self.frames:
+            self.frames[-1][3] += spent
+
+    def stack(self, sid):
+        """The ';'-joined frame names of a stack id, outermost first."""
+        names = []
+        while sid:
+            sid, name = self._parents[sid]
+            names.append(name)
+        return ";".join(reversed(names))
+
+    def hit(self, line):
+        source = self.frames[-1][1] if self.frames else None
+        self.hits[(source, line)] += 1
+
+    def report(self, file=sys.stderr, limit=20):
+        print(f"{'function':<24}{'calls':>10}{'incl ms':>12}{'excl ms':>12}{'excl/call us':>14}", file=file)
+        for name in sorted(self.calls, key=lambda n: -self.exclusive[n]):
+            calls = self.calls[name]
+            print(f"{name:<24}{calls:>10}{self.inclusive[name] * 1e3:>12.2f}"
+                  f"{self.exclusive[name] * 1e3:>12.2f}{self.exclusive[name] / calls * 1e6:>14.2f}", file=file)
+        print(file=file)
+        print(f"{'line':<32}{'hits':>10}", file=file)
+        for (source, line), hits in self.hits.most_common(limit):
+            where = f"{Path(source).name if source else '?'}:{line}"
+            print(f"{where:<32}{hits:>10}", file=file)
+
+    def write_collapsed(self, path):
+        """
+        One 'frame;frame;frame microseconds' line per stack, for flamegraph
+        tools. Recursive calls are folded into their outermost frame.
+        """
+        lines = sorted((self.stack(sid), round(spent * 1e6)) for sid, spent in self.stacks.items())
+        with open(path, "w") as f:
+            for stack, us in lines:
+                if us:
+                    f.write(f"{stack} {us}\n")
+
+
+# Objects of this module that compiled code refers to. They are pickled by name
+# so a cache written by `python interpreter.py` loads under `import interpreter`.
+_persistent = {"Stmt": Stmt, "Code": Code, "Function": Function, "Unit": Unit, "TunRun": TunRun}
+# BINARY and UNARY ops hold the operator's function; those defined here join
+# by name, so a new operator cannot be left out
+_persistent.update((f.__name__, f) for f in (*binary_ops.values(), *unary_ops.values())
+                   if getattr(f, "__globals__", None) is globals())
+_persistent_ids = {id(obj): name for name, obj in _persistent.items()}
+_interp_digest = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+
+class _CachePickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        return _persistent_ids.get(id(obj))
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        return _persistent[pid]
+
+
+def _cache_path(path):
+    return path.parent / "__pmocache__" / f"{path.name}.{sys.implementation.cache_tag}.pmoc"
+
+
+def _read_cache(path, stamp):
+    if not use_disk_cache:
+        return None
+    try:
+        with open(_cache_path(path), "rb") as f:
+            digest, unit = _CacheUnpickler(f).load()
+    except Exception:
+        return None
+    if digest != _interp_digest or not unit.fresh(stamp):
+        return None
+    return unit
+
+
+def _write_cache(path, unit):
+    if not use_disk_cache:
+        return
+    target = _cache_path(path)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    try:
+        target.parent.mkdir(exist_ok=True)
+        with open(tmp, "wb") as f:
+            _CachePickler(f, pickle.HIGHEST_PROTOCOL).dump((_interp_digest, unit))
+        os.replace(tmp, target)
+    except (OSError, pickle.PicklingError, RecursionError):
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+# ---- batch runs ------------------------------------------------------------
+
+_worker = None
+
+
+def _warm_worker():
+    """
+    Pool initializer: compile every stdlib and userlib module once so scripts
+    in this worker only pay for their own parse. Modules are still loaded per
+    script by REF, so no script sees names it did not import.
+    """
+    global _worker
+    _worker = Interpreter()
+    for name in stdlib + userlib:
+        try:
+            compile_file(_module_path(name))
+        except Exception:
+            pass
+
+
+def _run_captured(path):
+    if _worker is None:
+        _warm_worker()
+    out, err = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(out), redirect_stderr(err):
+        code = _worker.run_file(path)
+    return path, code, out.getvalue(), err.getvalue(), time.perf_counter() - start
+
+
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def run_batch(paths, workers=None):
+    """
+    Run many scripts across a pool of pre-warmed worker processes. Returns
+    one (path, exit_code, stdout, stderr, seconds) tuple per script, in the
+    order the paths were given.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers == 1:
+        return [_run_captured(p) for p in paths]
+    chunk = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+        return list(pool.map(_run_captured, paths, chunksize=chunk))
+
+
+def batch_main(args):
+    workers = None
+    if len(args) >= 2 and args[0] in ("-j", "--jobs"):
+        workers = int(args[1])
+        args = args[2:]
+    paths = expand_paths(args)
+    if not paths:
+        print("Usage: interpreter.py --batch [-j N] <script.tspmo | glob>...", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(paths, workers)
+    failed = 0
+    for path, code, out, err, seconds in results:
+        print(f"== {path} (exit {code}, {seconds:.3f}s)")
+        sys.stdout.write(out)
+        sys.stderr.write(err)
+        failed += code != 0
+    print(f"== {len(results)} scripts, {failed} failed, {time.perf_counter() - start:.3f}s")
+    return 1 if failed else 0
+
+
+def profile_main(args):
+    if not 1 <= len(args) <= 2:
+        print("Usage: interpreter.py --profile <script.tspmo> [stacks.collapsed]", file=sys.stderr)
+        return 1
+    interp = Interpreter()
+    interp.profiler = Profiler()
+    code = interp.run_file(args[0])
+    out = args[1] if len(args) == 2 else str(Path(args[0]).with_suffix(".collapsed"))
+    interp.profiler.report()
+    if interp.memos:
+        interp.memo_report()
+    interp.profiler.write_collapsed(out)
+    print(f"collapsed stacks written to {out}", file=sys.stderr)
+    return code
+
+
+def main():
+    global plain_output, output_buffer, stream_size
+    args = sys.argv[1:]
+    while args and args[0] in ("--plain", "--stream", "--buffer"):
+        if args[0] == "--plain":
+            plain_output = True
+            args = args[1:]
+        elif args[0] == "--stream":
+            stream_size = 0
+            args = args[1:]
+        elif len(args) >= 2 and args[1].isdigit():
+            output_buffer = int(args[1])
+            args = args[2:]
+        else:
+            break
+    if args and args[0] == "--batch":
+        sys.exit(batch_main(args[1:]))
+    if args and args[0] == "--profile":
+        sys.exit(profile_main(args[1:]))
+
+    if len(args) != 1:
+        print("Usage: interpreter.py [--plain] [--stream] [--buffer CHARS] <script.tspmo>", file=sys.stderr)
+        print("       interpreter.py [options] --batch [-j N] <script.tspmo | glob>...", file=sys.stderr)
+        print("       interpreter.py [options] --profile <script.tspmo> [stacks.collapsed]", file=sys.stderr)
+        sys.exit(1)
+
+    script_path = args[0]
+    exit_code   = run_file(script_path)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
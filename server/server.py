@@ -5,7 +5,10 @@ TSPMO Language Server with run‐file support
 
 import sys
 import re
+import asyncio
 import threading
+import uuid
+from collections import Counter
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 
@@ -15,6 +18,10 @@ from lsprotocol.types import (
     TEXT_DOCUMENT_HOVER,
     TEXT_DOCUMENT_DID_OPEN,
     TEXT_DOCUMENT_DID_CHANGE,
+    TEXT_DOCUMENT_DID_CLOSE,
+    TEXT_DOCUMENT_DEFINITION,
+    INITIALIZED,
+    WORKSPACE_DID_CHANGE_WATCHED_FILES,
     CompletionParams,
     CompletionList,
     CompletionItem,
@@ -25,35 +32,419 @@ from lsprotocol.types import (
     MarkupKind,
     DidOpenTextDocumentParams,
     DidChangeTextDocumentParams,
+    DidCloseTextDocumentParams,
+    DidChangeWatchedFilesParams,
+    DefinitionParams,
+    FileChangeType,
+    InitializedParams,
+    Location,
     Diagnostic,
     DiagnosticSeverity,
     Range,
-    Position
+    Position,
+    WorkDoneProgressBegin,
+    WorkDoneProgressReport,
+    WorkDoneProgressEnd,
 )
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Import your interpreter’s run_file() from interpreter.py
+# Import the parser check from interpreter.py; scripts themselves run in a
+# separate interpreter.py process so they can't block or pollute the server
 root = Path(__file__).resolve().parent
 sys.path.insert(0, str(root))
-from interpreter import run_file
+from interpreter import check_tokens, stdlib_dir, userlib_dir
 # ──────────────────────────────────────────────────────────────────────────────
 
-def parse_docstrings(text: str) -> dict[str, str]:
+_word_re = re.compile(r"\S+")
+
+def tokenize_line(line: str) -> list[tuple[int, str]]:
+    return [(m.start(), m.group()) for m in _word_re.finditer(line)]
+
+def words(tokens):
+    """(line, col, token) for every token outside -> ... <- comments."""
+    in_comment = False
+    for ln, toks in enumerate(tokens):
+        for col, tok in toks:
+            if in_comment:
+                in_comment = tok != '<-'
+            elif tok == '->':
+                in_comment = True
+            else:
+                yield ln, col, tok
+
+class _Def:
+    """A function header; its locals are keyed by identity, not by name."""
+    __slots__ = ('name', 'params')
+
+    def __init__(self, name, params):
+        self.name, self.params = name, params
+
+# scope state carried into a line: in comment, current _Def, LEBRON header
+# being read, 'ts'/'rizz' if the next word may be assigned, inside REF ... DO
+_START = (False, None, None, None, False)
+_NO_FACTS = ((), (), ())
+
+def scan_line(state, toks, reuse, stop=None):
+    """
+    Carry the scope state across one line's tokens. Returns the state after
+    them and the line's facts: (defs, assigns, imports), an assign being
+    (_Def or None, name). A header matching one in reuse takes that _Def
+    out of it and keeps it. With stop, only what the cursor at that column
+    is past counts.
+    """
+    comment, fn, header, pending, reading = state
+    defs, assigns, imports = [], [], []
+    for col, tok in toks:
+        if stop is not None and (col if tok == 'GOAT' else col + len(tok)) > stop:
+            break
+        if comment:
+            comment = tok != '<-'
+            continue
+        if tok == '->':
+            comment = True
+            continue
+        if header is not None:
+            stage, name, params = header
+            if stage == 'LEBRON' and tok == 'legoat':
+                header = ('legoat', None, ())
+            elif stage != 'params':
+                header = ('params', tok, ())
+            elif tok != 'ngl':
+                header = ('params', name, params + (tok,))
+            else:
+                fn = next((d for d in reuse if d.name == name and d.params == params), None)
+                if fn is None:
+                    fn = _Def(name, params)
+                else:
+                    reuse.remove(fn)
+                defs.append(fn)
+                header = None
+        elif tok == 'LEBRON':
+            header, fn = ('LEBRON', None, ()), None
+        elif tok == 'GOAT':
+            fn = None
+        elif pending == 'rizz':
+            assigns.append((fn, tok))
+        if tok == 'REF':
+            reading = True
+        elif tok == 'DO':
+            reading = False
+        elif reading and tok.replace(',', ''):
+            imports.append(tok.replace(',', ''))
+        pending = 'ts' if tok == 'ts' else 'rizz' if tok == 'rizz' and pending == 'ts' else None
+    return (comment, fn, header, pending, reading), (tuple(defs), tuple(assigns), tuple(imports))
+
+def _tally(counter, key, sign):
+    counter[key] += sign
+    if not counter[key]:
+        del counter[key]
+
+class DocIndex:
+    """
+    Whitespace tokens of one open document, kept per line so an edit only
+    re-tokenizes the lines it touches. Alongside them it keeps the scope
+    state entering each line and what each line defines, so an edit only
+    rescans until that state settles; completions and imports read the
+    totals. The rest (docstrings, scopes) is derived from the tokens once
+    per version and shared until the next edit. Readers on other threads
+    than the one applying edits take a snapshot().
+    """
+
+    def __init__(self, text: str, version=None):
+        self.lock = threading.Lock()
+        self.version = version
+        self.lines = text.split('\n')
+        self.tokens = [tokenize_line(l) for l in self.lines]
+        self._views: dict = {}
+        self._index()
+
+    def apply(self, change, version=None):
+        with self.lock:
+            self.version = version
+            self._views.clear()
+            rng = getattr(change, 'range', None)
+            if rng is None:
+                self.lines = change.text.split('\n')
+                self.tokens = [tokenize_line(l) for l in self.lines]
+                self._index()
+                return
+            start, end = rng.start, rng.end
+            last = len(self.lines) - 1
+            head = self.lines[start.line][:start.character] if start.line <= last else ''
+            tail = self.lines[end.line][end.character:] if end.line <= last else ''
+            new = (head + change.text + tail).split('\n')
+            self.lines[start.line:end.line + 1] = new
+            self.tokens[start.line:end.line + 1] = [tokenize_line(l) for l in new]
+            if start.line > last:
+                self._index()
+            else:
+                self._splice(start.line, min(end.line, last), len(new))
+
+    def _index(self):
+        self._entry, self._facts = [_START], []
+        self._funcs, self._globals, self._locals = Counter(), Counter(), {}
+        self._imports = None
+        self._entry += [None] * len(self.tokens)
+        self._facts += [_NO_FACTS] * len(self.tokens)
+        self._rescan(0, len(self.tokens), [])
+
+    def _splice(self, first, last, count):
+        """Lines first..last were replaced by count new ones."""
+        reuse = []
+        for facts in self._facts[first:last + 1]:
+            self._count(facts, -1)
+            reuse += facts[0]
+        self._facts[first:last + 1] = [_NO_FACTS] * count
+        self._entry[first + 1:last + 1] = [None] * (count - 1)
+        self._rescan(first, first + count, reuse)
+
+    def _rescan(self, line, settled, reuse):
+        """
+        Rescan from line on; past settled, stop at the first line whose
+        entry state is what it was before.
+        """
+        while line < len(self.tokens):
+            old = self._facts[line]
+            reuse += old[0]
+            state, facts = scan_line(self._entry[line], self.tokens[line], reuse)
+            self._count(old, -1)
+            self._count(facts, 1)
+            self._facts[line] = facts
+            line += 1
+            if line >= settled and self._entry[line] == state:
+                return
+            self._entry[line] = state
+
+    def _count(self, facts, sign):
+        defs, assigns, imports = facts
+        for d in defs:
+            _tally(self._funcs, d.name, sign)
+        for fn, name in assigns:
+            if fn is None:
+                _tally(self._globals, name, sign)
+            else:
+                _tally(self._locals.setdefault(fn, Counter()), name, sign)
+                if not self._locals[fn]:
+                    del self._locals[fn]
+        if imports:
+            self._imports = None
+
+    def scope_at(self, line: int, col: int):
+        """
+        Function names, global names, and (params, locals) of the function
+        the cursor is inside (None outside any), all names sorted.
+        """
+        with self.lock:
+            fn = None
+            if 0 <= line < len(self.tokens):
+                state, _ = scan_line(self._entry[line], self.tokens[line], list(self._facts[line][0]), col)
+                fn = state[1]
+            current = None
+            if fn is not None:
+                current = (list(fn.params), sorted(self._locals.get(fn, ())))
+            return sorted(self._funcs), sorted(self._globals), current
+
+    def snapshot(self):
+        """The version and per-line tokens as of one moment, safe to read while edits land."""
+        with self.lock:
+            return self.version, list(self.tokens)
+
+    def _view(self, name, build):
+        with self.lock:
+            if name not in self._views:
+                self._views[name] = build()
+            return self._views[name]
+
+    def words(self):
+        return words(self.tokens)
+
+    def token_at(self, line: int, col: int):
+        if not 0 <= line < len(self.tokens):
+            return None
+        for start, tok in self.tokens[line]:
+            if start <= col <= start + len(tok):
+                return start, tok
+            if start > col:
+                break
+        return None
+
+    def docstrings(self) -> dict[str, str]:
+        return self._view('docstrings', self._build_docstrings)
+
+    def scopes(self):
+        return self._view('scopes', self._build_scopes)
+
+    def imports(self) -> tuple[str, ...]:
+        with self.lock:
+            if self._imports is None:
+                self._imports = tuple(name for facts in self._facts for name in facts[2])
+            return self._imports
+
+    def _build_docstrings(self) -> dict[str, str]:
+        """
+        Map function names to the first -> ... <- comment block in their body.
+        """
+        docs: dict[str, str] = {}
+        flat = [(ln, col, tok) for ln, toks in enumerate(self.tokens) for col, tok in toks]
+        i = 0
+        while i < len(flat):
+            if flat[i][2] != 'LEBRON' or i + 1 >= len(flat):
+                i += 1
+                continue
+            if flat[i + 1][2] == 'legoat' and i + 2 < len(flat):
+                i += 1
+            name = flat[i + 1][2]
+            i += 2
+            while i < len(flat) and flat[i][2] != 'ngl':
+                i += 1
+            while i < len(flat) and flat[i][2] not in ('->', 'GOAT'):
+                i += 1
+            if i < len(flat) and flat[i][2] == '->':
+                j = i + 1
+                while j < len(flat) and flat[j][2] != '<-':
+                    j += 1
+                if j < len(flat):
+                    docs[name] = self._text_between(flat[i][0], flat[i][1] + 2, flat[j][0], flat[j][1]).strip()
+                i = j
+        return docs
+
+    def _text_between(self, l0, c0, l1, c1) -> str:
+        if l0 == l1:
+            return self.lines[l0][c0:c1]
+        return '\n'.join([self.lines[l0][c0:]] + self.lines[l0 + 1:l1] + [self.lines[l1][:c1]])
+
+    def _build_scopes(self):
+        """
+        Functions with their parameters, locals and (line, col) extent, plus
+        the names assigned at top level.
+        """
+        scopes, globals_ = [], set()
+        current = None
+        words = list(self.words())
+        for i, (ln, col, tok) in enumerate(words):
+            if tok == 'LEBRON' and i + 1 < len(words):
+                k = i + 2 if words[i + 1][2] == 'legoat' and i + 2 < len(words) else i + 1
+                j = k + 1
+                params_list = []
+                while j < len(words) and words[j][2] != 'ngl':
+                    params_list.append(words[j][2])
+                    j += 1
+                start = (words[j][0], words[j][1] + 3) if j < len(words) else (ln, col)
+                current = {'name': words[k][2], 'start': start, 'end': None,
+                           'params': params_list, 'locals': set(),
+                           'at': (words[k][0], words[k][1])}
+                scopes.append(current)
+            elif tok == 'GOAT' and current is not None:
+                current['end'] = (ln, col)
+                current = None
+            elif tok == 'rizz' and i > 0 and words[i - 1][2] == 'ts' and i + 1 < len(words):
+                var = words[i + 1][2]
+                (current['locals'] if current is not None else globals_).add(var)
+        if current is not None:
+            current['end'] = (len(self.lines), 0)
+        return scopes, globals_
+
+# open documents by URI
+documents: dict[str, DocIndex] = {}
+
+class Symbol:
+    def __init__(self, name, params, doc, module, uri, line, col):
+        self.name = name
+        self.params = params
+        self.doc = doc
+        self.module = module
+        self.uri = uri
+        self.line = line
+        self.col = col
+
+    def markdown(self) -> str:
+        head = f"**{' '.join([self.name] + self.params)}** ({self.module})"
+        return f"{head}\n\n{self.doc}" if self.doc else head
+
+    def location(self) -> Location:
+        return Location(self.uri, Range(Position(self.line, self.col),
+                                        Position(self.line, self.col + len(self.name))))
+
+class ModuleIndex:
     """
-    Map function names to the first -> ... <- comment block in their body.
+    Functions declared in every stdlib and userlib module. Each file is parsed
+    once, then re-parsed only when the file watcher reports it changed. The
+    functions visible through a set of REFs are resolved once and cached until
+    a module changes, so hover and completion lookups are dict hits.
     """
-    docs: dict[str, str] = {}
-    for fn in re.finditer(r'\bLEBRON\s+(\w+)(?:\s+\w+)*\s+ngl\b', text):
-        name = fn.group(1)
-        start = fn.end()
-        tail = text[start:]
-        goat_m = re.search(r'\bGOAT\b', tail)
-        end = goat_m.start() if goat_m else len(tail)
-        body = tail[:end]
-        cm = re.search(r'->([\s\S]*?)<-', body)
-        if cm:
-            docs[name] = cm.group(1).strip()
-    return docs
+
+    def __init__(self, dirs):
+        self.dirs = [Path(d) for d in dirs]
+        self.lock = threading.Lock()
+        self.files: dict[str, tuple[dict[str, Symbol], tuple[str, ...]]] = {}
+        self._visible: dict[tuple[str, ...], dict[str, Symbol]] = {}
+
+    def build(self):
+        for d in self.dirs:
+            for path in sorted(d.glob('*.pmo')):
+                self.update(path)
+
+    def covers(self, path: Path) -> bool:
+        return path.suffix == '.pmo' and path.parent in self.dirs
+
+    def update(self, path: Path):
+        try:
+            text = path.read_text(encoding='utf-8')
+        except OSError:
+            self.remove(path)
+            return
+        index = DocIndex(text)
+        scopes, _ = index.scopes()
+        docs = index.docstrings()
+        module, uri = path.stem, path.as_uri()
+        symbols = {s['name']: Symbol(s['name'], s['params'], docs.get(s['name'], ''),
+                                     module, uri, *s['at'])
+                   for s in scopes}
+        with self.lock:
+            self.files[str(path)] = (symbols, index.imports())
+            self._visible.clear()
+
+    def remove(self, path: Path):
+        with self.lock:
+            if self.files.pop(str(path), None) is not None:
+                self._visible.clear()
+
+    def _module(self, name):
+        # same lookup order as the interpreter: stdlib first, then userlib
+        for d in self.dirs:
+            entry = self.files.get(str(d / f"{name}.pmo"))
+            if entry is not None:
+                return entry
+        return None
+
+    def visible(self, imports: tuple[str, ...]) -> dict[str, Symbol]:
+        """Functions reachable through imports, including modules they REF."""
+        with self.lock:
+            found = self._visible.get(imports)
+            if found is None:
+                found, seen, pending = {}, set(), list(imports)
+                while pending:
+                    name = pending.pop(0)
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                    entry = self._module(name)
+                    if entry is not None:
+                        symbols, deps = entry
+                        for fname, sym in symbols.items():
+                            found.setdefault(fname, sym)
+                        pending.extend(deps)
+                self._visible[imports] = found
+            return found
+
+symbols = ModuleIndex([stdlib_dir, userlib_dir])
+
+def get_index(ls: LanguageServer, uri: str) -> DocIndex:
+    index = documents.get(uri)
+    if index is None:
+        doc = ls.workspace.get_document(uri)
+        index = documents[uri] = DocIndex(doc.source, doc.version)
+    return index
 
 KEYWORD_DOCS = {
     "tun": "**tun**: Integer incrementer.",
@@ -101,6 +492,7 @@ KEYWORD_DOCS = {
     "gurt": "**gurt**: Closes a loop.",
     "REF": "**REF [modules] DO SOMETHING**: Imports modules.",
     "LEBRON": "**LEBRON [name] [params] ngl**: Declares a function.",
+    "legoat": "**LEBRON legoat [name] [params] ngl**: Declares a pure function whose results are cached.",
     "GOAT": "**GOAT**: Ends a function declaration.",
 }
 
@@ -109,10 +501,9 @@ debouncers: dict[str, threading.Timer] = {}
 
 # 1) Instantiate the language server
 server = LanguageServer('tspmo-language-server', '0.1.0')
-server.user_docs: dict[str, str] = {}
 
 # 2) Keyword/operator groups for completion
-CONTROL   = ["LEBRON","ngl","GOAT","hawk","lion","tiger","fr","ong","kid","gurt","REF","DO SOMETHING"]
+CONTROL   = ["LEBRON","legoat","ngl","GOAT","hawk","lion","tiger","fr","ong","kid","gurt","REF","DO SOMETHING"]
 DECL      = ["rizz","yap","sybau","dih","yo"]
 SEC_OP    = ["chat?","spill","sayong","tf","lowkey"]
 ARITH     = ["touch","#shrink","cavendish","big25","crockpot","bigf"]
@@ -139,190 +530,293 @@ def make_completions() -> CompletionList:
                                     kind=CompletionItemKind.Value))
     return CompletionList(is_incomplete=False, items=items)
 
-def pos_from_idx(text: str, idx: int) -> Position:
-    line = text.count('\n', 0, idx)
-    col  = idx - (text.rfind('\n', 0, idx) + 1)
-    return Position(line, col)
-
-def lint_text(text: str) -> list[Diagnostic]:
+def lint_text(index: DocIndex) -> list[Diagnostic]:
     diags: list[Diagnostic] = []
-    # count tokens
-    hawk_count  = len(re.findall(r'\bhawk\b', text))
-    ong_count   = len(re.findall(r'\bong\b', text))
-    cond_count  = len(re.findall(r'\b(?:lion|tiger)\b', text))
-    fr_count    = len(re.findall(r'\bfr\b', text))
-    yo_count    = len(re.findall(r'\byo\b', text))
-    kid_count   = len(re.findall(r'\bkid\b', text))
-    gurt_count  = len(re.findall(r'\bgurt\b', text))
-    ts_count    = len(re.findall(r'\bts\b', text))
-    pmo_count   = len(re.findall(r'\bpmo\b', text))
-    legit_count = len(re.findall(r'\blegit\b', text))
-    bro_count   = len(re.findall(r'\bbro\b', text))
-
-    if ts_count != pmo_count:
-        diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"'ts' count ({ts_count}) != 'pmo' count ({pmo_count})",
-            DiagnosticSeverity.Error
-        ))
-    if legit_count != bro_count:
-        diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"'legit' count ({legit_count}) != 'bro' count ({bro_count})",
-            DiagnosticSeverity.Error
-        ))
-    if hawk_count > ong_count:
-        diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"Unpopped flags: {hawk_count} hawk(s) vs {ong_count} ong(s)",
-            DiagnosticSeverity.Warning
-        ))
-    if cond_count > fr_count:
-        diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"{cond_count} conditional(s) but only {fr_count} 'fr'",
-            DiagnosticSeverity.Error
-        ))
-    if kid_count != gurt_count:
-        diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"{kid_count} 'kid' vs {gurt_count} 'gurt' loops",
-            DiagnosticSeverity.Error
-        ))
-    if kid_count > yo_count:
+
+    # runs on the debounce timer thread while edits keep landing
+    _, lines = index.snapshot()
+
+    # structural errors, located by the parser's check mode
+    tokens, positions = [], []
+    for ln, toks in enumerate(lines):
+        for col, tok in toks:
+            tokens.append(tok)
+            positions.append((ln, col, col + len(tok)))
+    for (ln, col, end), msg in check_tokens(tokens, positions):
         diags.append(Diagnostic(
-            Range(pos_from_idx(text,0), pos_from_idx(text,1)),
-            f"{kid_count} loops opened but only {yo_count} 'yo'",
+            Range(Position(ln, col), Position(ln, end)),
+            msg,
             DiagnosticSeverity.Error
         ))
 
-    return diags
+    # flags are pushed and popped at run time, so these stay heuristics:
+    # hawks pair with ongs within a function, lion/tiger with fr within a
+    # block (a function or kid body), innermost first
+    def at(ln, col, tok):
+        return Range(Position(ln, col), Position(ln, col + len(tok)))
+
+    def close(frame):
+        for ln, col, tok in frame['flags']:
+            diags.append(Diagnostic(at(ln, col, tok), "hawk is never popped by an ong",
+                                    DiagnosticSeverity.Warning))
+        for ln, col, tok in frame['branches']:
+            diags.append(Diagnostic(at(ln, col, tok), f"'{tok}' is never closed with fr",
+                                    DiagnosticSeverity.Error))
 
-def idx_from_pos(text: str, line: int, col: int) -> int:
-    lines = text.splitlines(True)
-    return sum(len(lines[i]) for i in range(line)) + col
+    frames = [{'flags': [], 'branches': [], 'block': None}]
+    in_string = False
+    for ln, col, tok in words(lines):
+        frame = frames[-1]
+        if in_string or tok == 'legit':
+            in_string = tok != 'bro'
+        elif tok == 'hawk':
+            frame['flags'].append((ln, col, tok))
+        elif tok == 'ong':
+            # an ong in a kid body may pop a flag from around the loop
+            owner = next(f for f in reversed(frames) if f['flags'] or f['block'] != 'kid')
+            if owner['flags']:
+                owner['flags'].pop()
+            else:
+                diags.append(Diagnostic(at(ln, col, tok), "ong has no hawk to pop",
+                                        DiagnosticSeverity.Warning))
+        elif tok in ('lion', 'tiger'):
+            frame['branches'].append((ln, col, tok))
+        elif tok == 'fr':
+            if frame['branches']:
+                frame['branches'].pop()
+            else:
+                diags.append(Diagnostic(at(ln, col, tok), "fr has no lion or tiger to close",
+                                        DiagnosticSeverity.Warning))
+        elif tok in ('kid', 'LEBRON'):
+            frames.append({'flags': [], 'branches': [], 'block': tok})
+        elif len(frames) > 1 and (tok, frame['block']) in (('gurt', 'kid'), ('GOAT', 'LEBRON')):
+            frames.pop()
+            if tok == 'gurt':
+                # a loop body may leave flags for the code after it
+                frames[-1]['flags'] += frame['flags']
+                frame['flags'] = []
+            close(frame)
+    for frame in reversed(frames):
+        close(frame)
+
+    return diags
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 3) Register run-file command
+# 3) Register run-file commands
+run_timeout = 30.0
+# running interpreter processes by script path
+runs: dict[str, asyncio.subprocess.Process] = {}
+
+def path_from_uri(uri: str) -> str:
+    return unquote(urlparse(uri).path)
+
+async def stop_run(path: str = None) -> int:
+    """Kill the run of path, or every run if path is None."""
+    paths = list(runs) if path is None else [path]
+    stopped = 0
+    for p in paths:
+        proc = runs.pop(p, None)
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+            stopped += 1
+    return stopped
+
 @server.command('tspmo.runFile')
-def run_file_command(ls: LanguageServer, *args):
+async def run_file_command(ls: LanguageServer, *args):
     if not args:
         return "Error: no file URI provided"
-    uri = args[0]
-    parsed = urlparse(uri)
-    path = unquote(parsed.path)
-    code = run_file(path)
-    return f"Ran {path}, exit code {code}"
+    path = path_from_uri(args[0])
+    await stop_run(path)
+
+    token = str(uuid.uuid4())
+    try:
+        await ls.progress.create_async(token)
+    except Exception:
+        token = None    # client can't show progress; output still goes to the log
+
+    def report(message: str):
+        ls.show_message_log(message)
+        if token is not None:
+            ls.progress.report(token, WorkDoneProgressReport(message=message))
+
+    # stdin is closed so a chat? prompt fails instead of hanging the run
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-W", "ignore::SyntaxWarning", str(root / "interpreter.py"), path,
+        cwd=str(Path(path).parent),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    runs[path] = proc
+    if token is not None:
+        ls.progress.begin(token, WorkDoneProgressBegin(title=f"Running {Path(path).name}"))
+
+    async def pump():
+        # read in chunks rather than lines: one yap of a big list can be
+        # longer than any line limit the stream reader would accept
+        parts = []
+        while True:
+            chunk = await proc.stdout.read(1 << 16)
+            if not chunk:
+                break
+            *ends, rest = chunk.split(b"\n")
+            for end in ends:
+                parts.append(end)
+                report(b"".join(parts).decode(errors="replace").rstrip("\r"))
+                parts = []
+            parts.append(rest)
+        if any(parts):
+            report(b"".join(parts).decode(errors="replace").rstrip("\r"))
+        await proc.wait()
+
+    result = f"Cancelled {path}"
+    try:
+        await asyncio.wait_for(pump(), run_timeout)
+        if runs.get(path) is proc:
+            result = f"Ran {path}, exit code {proc.returncode}"
+    except asyncio.TimeoutError:
+        result = f"Stopped {path} after {run_timeout:g}s"
+    except Exception as e:
+        result = f"Stopped {path}: {e}"
+    finally:
+        # whatever went wrong, the child must not outlive the command
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if runs.get(path) is proc:
+            del runs[path]
+        if token is not None:
+            ls.progress.end(token, WorkDoneProgressEnd(message=result))
+    return result
+
+@server.command('tspmo.cancelRun')
+async def cancel_run_command(ls: LanguageServer, *args):
+    path = path_from_uri(args[0]) if args else None
+    stopped = await stop_run(path)
+    return f"Cancelled {stopped} run(s)"
 # ──────────────────────────────────────────────────────────────────────────────
 
 @server.feature(TEXT_DOCUMENT_HOVER)
 def hover(ls: LanguageServer, params: HoverParams):
-    uri = params.text_document.uri
-    doc = ls.workspace.get_document(uri)
+    index = get_index(ls, params.text_document.uri)
     pos = params.position
-    line = doc.source.splitlines()[pos.line]
-    for m in re.finditer(r"\b\w+\b|\b[#?]\w+\b", line):
-        if m.start() <= pos.character <= m.end():
-            token = m.group(0)
-            if token in ls.user_docs:
-                return Hover(
-                    contents=MarkupContent(kind=MarkupKind.Markdown,
-                                          value=ls.user_docs[token]),
-                    range=Range(Position(pos.line, m.start()),
-                                Position(pos.line, m.end()))
-                )
-            if token in KEYWORD_DOCS:
-                return Hover(
-                    contents=MarkupContent(kind=MarkupKind.Markdown,
-                                          value=KEYWORD_DOCS[token]),
-                    range=Range(Position(pos.line, m.start()),
-                                Position(pos.line, m.end()))
-                )
-            break
-    return None
+    found = index.token_at(pos.line, pos.character)
+    if found is None:
+        return None
+    start, token = found
+    value = index.docstrings().get(token)
+    if value is None:
+        sym = symbols.visible(index.imports()).get(token)
+        value = sym.markdown() if sym is not None else KEYWORD_DOCS.get(token)
+    if value is None:
+        return None
+    return Hover(
+        contents=MarkupContent(kind=MarkupKind.Markdown, value=value),
+        range=Range(Position(pos.line, start),
+                    Position(pos.line, start + len(token)))
+    )
 
 @server.feature(TEXT_DOCUMENT_COMPLETION)
 def completions(ls: LanguageServer, params: CompletionParams):
-    doc = ls.workspace.get_document(params.text_document.uri)
-    text = doc.source
-    cursor = idx_from_pos(text, params.position.line, params.position.character)
-
-    # gather function scopes
-    scopes = []
-    for m in re.finditer(r'\bLEBRON\s+(\w+)((?:\s+\w+)*)\s+ngl\b', text):
-        start = m.end()
-        name = m.group(1)
-        params_list = m.group(2).strip().split() if m.group(2).strip() else []
-        scopes.append({'name': name, 'start': start, 'end': None, 'params': params_list})
-    goat_positions = [m.start() for m in re.finditer(r'\bGOAT\b', text)]
-    for i, s in enumerate(scopes):
-        s['end'] = goat_positions[i] if i < len(goat_positions) else len(text)
-
-    # collect globals & locals
-    globals_, locals_ = set(), {s['name']: set() for s in scopes}
-    for m in re.finditer(r'\bts\s+rizz\s+(\w+)\b', text):
-        var, idx = m.group(1), m.start()
-        in_scope = False
-        for s in scopes:
-            if s['start'] <= idx < s['end']:
-                locals_[s['name']].add(var)
-                in_scope = True
-                break
-        if not in_scope:
-            globals_.add(var)
-
-    # current scope
-    current = None
-    for s in scopes:
-        if s['start'] <= cursor < s['end']:
-            current = s
-            break
+    index = get_index(ls, params.text_document.uri)
+    funcs, globals_, current = index.scope_at(params.position.line, params.position.character)
 
     # build items
     items = make_completions().items[:]
-    for s in scopes:
-        items.append(CompletionItem(label=s['name'],
+    for name in funcs:
+        items.append(CompletionItem(label=name,
                                     kind=CompletionItemKind.Function,
                                     detail="function"))
-    for v in sorted(globals_):
+    for sym in symbols.visible(index.imports()).values():
+        items.append(CompletionItem(label=sym.name,
+                                    kind=CompletionItemKind.Function,
+                                    detail=f"{sym.module} function",
+                                    documentation=sym.doc or None))
+    for v in globals_:
         items.append(CompletionItem(label=v,
                                     kind=CompletionItemKind.Variable,
                                     detail="global"))
     if current:
-        for p in current['params']:
+        params_, locals_ = current
+        for p in params_:
             items.append(CompletionItem(label=p,
                                         kind=CompletionItemKind.Variable,
                                         detail="param"))
-        for v in sorted(locals_[current['name']]):
+        for v in locals_:
             items.append(CompletionItem(label=v,
                                         kind=CompletionItemKind.Variable,
                                         detail="local"))
 
     return CompletionList(is_incomplete=False, items=items)
 
+@server.feature(TEXT_DOCUMENT_DEFINITION)
+def definition(ls: LanguageServer, params: DefinitionParams):
+    uri = params.text_document.uri
+    index = get_index(ls, uri)
+    found = index.token_at(params.position.line, params.position.character)
+    if found is None:
+        return None
+    token = found[1]
+    scopes, _ = index.scopes()
+    for s in scopes:
+        if s['name'] == token:
+            line, col = s['at']
+            return Location(uri, Range(Position(line, col), Position(line, col + len(token))))
+    sym = symbols.visible(index.imports()).get(token)
+    return sym.location() if sym is not None else None
+
+@server.feature(INITIALIZED)
+def initialized(ls: LanguageServer, params: InitializedParams):
+    threading.Thread(target=symbols.build, daemon=True).start()
+
+@server.feature(WORKSPACE_DID_CHANGE_WATCHED_FILES)
+def did_change_watched_files(ls: LanguageServer, params: DidChangeWatchedFilesParams):
+    for change in params.changes:
+        path = Path(path_from_uri(change.uri))
+        if not symbols.covers(path):
+            continue
+        if change.type == FileChangeType.Deleted:
+            symbols.remove(path)
+        else:
+            symbols.update(path)
+
 @server.feature(TEXT_DOCUMENT_DID_OPEN)
 def did_open(ls: LanguageServer, params: DidOpenTextDocumentParams):
     uri = params.text_document.uri
-    doc = ls.workspace.get_document(uri)
-    ls.publish_diagnostics(uri, lint_text(doc.source))
-    ls.user_docs = parse_docstrings(doc.source)
+    index = documents[uri] = DocIndex(params.text_document.text,
+                                      params.text_document.version)
+    ls.publish_diagnostics(uri, lint_text(index))
 
 @server.feature(TEXT_DOCUMENT_DID_CHANGE)
 def did_change(ls: LanguageServer, params: DidChangeTextDocumentParams):
     uri = params.text_document.uri
-    doc = ls.workspace.get_document(uri)
-    ls.user_docs = parse_docstrings(doc.source)
+    index = documents.get(uri)
+    if index is None:
+        get_index(ls, uri)
+    else:
+        for change in params.content_changes:
+            index.apply(change, params.text_document.version)
 
     if uri in debouncers:
         debouncers[uri].cancel()
 
     def do_lint():
-        d = ls.workspace.get_document(uri)
-        ls.publish_diagnostics(uri, lint_text(d.source))
+        index = documents.get(uri)
+        if index is not None:
+            ls.publish_diagnostics(uri, lint_text(index))
 
     t = threading.Timer(0.8, do_lint)
     debouncers[uri] = t
     t.start()
 
+@server.feature(TEXT_DOCUMENT_DID_CLOSE)
+def did_close(ls: LanguageServer, params: DidCloseTextDocumentParams):
+    uri = params.text_document.uri
+    documents.pop(uri, None)
+    timer = debouncers.pop(uri, None)
+    if timer is not None:
+        timer.cancel()
+
 if __name__ == '__main__':
     server.start_io()
@@ -0,0 +1,26 @@
+import sys
+import warnings
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+warnings.filterwarnings("ignore", category=SyntaxWarning)
+import interpreter  # noqa: E402
+
+
+@pytest.fixture
+def run(capsys):
+    """Run TSPMO source on a fresh Interpreter and return what it printed."""
+    def run(text, plain=True):
+        interp = interpreter.Interpreter()
+        interp.plain_output = plain
+        interp.run_source(text)
+        return capsys.readouterr().out
+    return run
+
+
+@pytest.fixture
+def no_disk_cache(monkeypatch):
+    monkeypatch.setattr(interpreter, "use_disk_cache", False)
+    monkeypatch.setattr(interpreter, "module_cache", {})
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Golden-output checks for the interpreter.
+
+Every tests/*.tspmo script is run through interpreter.py, once normally and
+once with --stream, and its stdout and exit status must match the .out file
+next to it (the exit status is its last line). The exit status of this
+script is 1 if any of them differ.
+
+    python tests/run_golden.py [--update] [-k SUBSTRING]
+
+--update rewrites the .out files from a normal run instead of comparing.
+test_golden.py runs the same checks under pytest.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+here = Path(__file__).resolve().parent
+INTERPRETER = here.parent / "server" / "interpreter.py"
+MODES = {"default": [], "stream": ["--stream"]}
+
+
+def run(script, options):
+    proc = subprocess.run(
+        [sys.executable, "-W", "ignore::SyntaxWarning", str(INTERPRETER), *options, script.name],
+        cwd=script.parent, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=120,
+    )
+    return f"{proc.stdout}exit {proc.returncode}\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--update", action="store_true", help="rewrite the .out files")
+    ap.add_argument("-k", default="", help="only scripts whose name contains this")
+    args = ap.parse_args()
+
+    failed = 0
+    scripts = [p for p in sorted(here.glob("*.tspmo")) if args.k in p.name]
+    for script in scripts:
+        expected_path = script.with_suffix(".out")
+        if args.update:
+            expected_path.write_text(run(script, MODES["default"]))
+            print(f"updated {expected_path.name}")
+            continue
+        expected = expected_path.read_text() if expected_path.is_file() else None
+        for mode, options in MODES.items():
+            ok = run(script, options) == expected
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {script.name} ({mode})")
+    if not args.update:
+        print(f"{len(scripts) * len(MODES) - failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import pytest
+
+import interpreter
+
+
+@pytest.fixture
+def scripts(tmp_path):
+    texts = {
+        "a.tspmo": "ts rizz x tun tun sahur pmo\nts yap x pmo\n",
+        "b.tspmo": "ts yap x pmo\n",  # must not see a.tspmo's x
+        "c.tspmo": "REF list DO SOMETHING\nts rizz l ls pmo\nts sybau ad l tun sahur pmo\nts sybau ad l tun sahur pmo\nts yap girth l pmo\n",
+    }
+    for name, text in texts.items():
+        (tmp_path / name).write_text(text)
+    return [str(tmp_path / name) for name in ("c.tspmo", "a.tspmo", "b.tspmo")]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch(scripts, workers):
+    results = interpreter.run_batch(scripts * 3, workers)
+    assert [r[0] for r in results] == scripts * 3
+    for path, code, out, err, seconds in results:
+        if path.endswith("a.tspmo"):
+            assert (code, out, err) == (0, "tun tun sahur (1)\n", "")
+        elif path.endswith("b.tspmo"):
+            assert code == 1 and out == "" and "Unknown variable x" in err
+        else:
+            assert (code, out, err) == (0, "tun tun tun sahur (2)\n", "")
+        assert seconds >= 0
+
+
+def test_expand_paths(scripts, tmp_path):
+    assert interpreter.expand_paths([str(tmp_path / "*.tspmo"), "x.tspmo"]) == sorted(scripts) + ["x.tspmo"]
+    assert interpreter.run_batch([]) == []
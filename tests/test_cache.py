@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import interpreter
+
+
+@pytest.fixture
+def userlib(tmp_path, monkeypatch):
+    lib = tmp_path / "userlib"
+    lib.mkdir()
+    monkeypatch.setattr(interpreter, "userlib_dir", lib)
+    monkeypatch.setattr(interpreter, "module_cache", {})
+    monkeypatch.setattr(interpreter, "use_disk_cache", True)
+    return lib
+
+
+def fresh_process():
+    # a new process starts with an empty module_cache and reads __pmocache__
+    interpreter.module_cache.clear()
+
+
+def run_file(path, capsys):
+    code = interpreter.Interpreter().run_file(path)
+    out, err = capsys.readouterr()
+    return code, out, err
+
+
+def test_cache_is_written_and_reused(tmp_path, userlib):
+    script = tmp_path / "main.tspmo"
+    script.write_text("ts yap legit hi bro pmo\n")
+    unit = interpreter.compile_file(script)
+    assert interpreter._cache_path(script.resolve()).is_file()
+    fresh_process()
+    cached = interpreter.compile_file(script)
+    assert cached is not unit
+    assert cached.body.ops == unit.body.ops
+
+
+def test_changed_module_invalidates_importer(tmp_path, userlib, capsys):
+    (userlib / "mm.pmo").write_text("LEBRON fm ngl\nts dih legit one bro pmo\nGOAT\n")
+    script = tmp_path / "main.tspmo"
+    script.write_text("REF mm DO SOMETHING\nts yap fm pmo\n")
+    assert run_file(script, capsys)[1] == "legit one bro (one)\n"
+    fresh_process()
+    (userlib / "mm.pmo").write_text("LEBRON fm x ngl\nts dih x pmo\nGOAT\n")
+    script.write_text("REF mm DO SOMETHING\nts yap fm 2 pmo\n")
+    os.utime(script, ns=(0, 0))
+    assert run_file(script, capsys)[1] == "tun tun tun sahur (2)\n"
+
+
+def test_module_added_after_caching(tmp_path, userlib, capsys):
+    script = tmp_path / "main.tspmo"
+    script.write_text("REF mm DO SOMETHING\nts yap fm pmo\n")
+    code, _, err = run_file(script, capsys)
+    assert code == 1 and "Failed to load module mm" in err
+    assert interpreter._cache_path(script.resolve()).is_file()
+
+    fresh_process()
+    (userlib / "mm.pmo").write_text("LEBRON fm ngl\nts dih legit found bro pmo\nGOAT\n")
+    assert run_file(script, capsys) == (0, "legit found bro (found)\n", "")
@@ -0,0 +1,12 @@
+import pytest
+
+from run_golden import MODES, here, run
+
+scripts = sorted(here.glob("*.tspmo"))
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("script", scripts, ids=[s.stem for s in scripts])
+def test_golden(script, mode):
+    # streaming a script statement by statement must print what compiling it whole does
+    assert run(script, MODES[mode]) == script.with_suffix(".out").read_text()
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+import interpreter
+
+
+def call(module, name, args, natives):
+    interp = interpreter.Interpreter()
+    interp.use_natives = natives
+    names = [f"a{i}" for i in range(len(args))]
+    for n, a in zip(names, args):
+        interp.sym[n] = a[:] if isinstance(a, list) else a
+    tokens, lines = interpreter._lex_with_lines(f"REF {module} DO SOMETHING\nts dih {name} {' '.join(names)} pmo")
+    result = interp.run_code(interpreter.assemble(interpreter.Parser(tokens, lines).parse()))
+    return result, [interp.sym[n] for n in names]
+
+
+rng = random.Random(5)
+lists = [[], [4], [2, 1], [rng.randrange(-50, 50) for _ in range(9)], [3, 3, 1]]
+cases = (
+    [("list", "sort", [l]) for l in lists]
+    + [("list", "popi", [l, i]) for l in lists if l for i in (0, len(l) - 1)]
+    + [("list", f, [l]) for l in lists if l for f in ("min", "max", "i.mean", "f.mean")]
+    + [("math", "pow", [x, p]) for x in (0, 3, -2, 1.5) for p in (0, 1, 5)]
+    + [("math", "!", [x]) for x in (0, 1, 6)]
+    + [("math", "gcd", [x, y]) for x, y in ((12, 18), (7, 0), (0, 5), (13, 8))]
+)
+
+
+@pytest.mark.parametrize("module, name, args", cases)
+def test_native_matches_fallback(module, name, args):
+    # same result and the same effect on list arguments
+    assert call(module, name, args, True) == call(module, name, args, False)
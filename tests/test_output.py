@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import interpreter
+
+
+def test_output_buffers_until_limit(capsys):
+    out = interpreter.Output(limit=10)
+    out.write("abc\n")
+    assert capsys.readouterr().out == ""
+    out.write("defghi\n")
+    assert capsys.readouterr().out == "abc\ndefghi\n"
+    out.write("j\n")
+    out.flush()
+    assert capsys.readouterr().out == "j\n"
+
+
+def test_unbuffered_output_writes_every_line(capsys):
+    out = interpreter.Output(limit=0)
+    out.write("a\n")
+    assert capsys.readouterr().out == "a\n"
+
+
+def test_plain_prints_values(run):
+    text = "ts yap tun tun sahur pmo\nts yap legit hi bro pmo\n"
+    assert run(text, plain=False) == "tun tun sahur (1)\nlegit hi bro (hi)\n"
+    assert run(text) == "1\nhi\n"
+
+
+def test_input_prompt_comes_after_pending_output(run, monkeypatch, capsys):
+    seen = []
+    monkeypatch.setattr("builtins.input", lambda prompt: seen.append(capsys.readouterr().out) or "typed")
+    assert run("ts yap legit before bro pmo\nts yap chat? legit ? bro pmo\n") == "typed\n"
+    assert seen == ["before\n"]
+
+
+def test_output_before_an_error_is_written(tmp_path, capsys, no_disk_cache):
+    script = tmp_path / "err.tspmo"
+    script.write_text("ts yap legit first bro pmo\nts yap x pmo\n")
+    interp = interpreter.Interpreter()
+    interp.plain_output = True
+    assert interp.run_file(str(script)) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "first\n" and "Unknown variable x" in captured.err
+
+
+def test_plain_flag(tmp_path):
+    script = tmp_path / "plain.tspmo"
+    script.write_text("ts yap touch tun tun sahur tun tun sahur pmo\n")
+    proc = subprocess.run([sys.executable, "-W", "ignore", interpreter.__file__, "--plain", "--buffer", "0", str(script)],
+                          capture_output=True, text=True, timeout=60)
+    assert (proc.returncode, proc.stdout) == (0, "2\n")
@@ -0,0 +1,39 @@
+import pytest
+
+import interpreter
+
+
+def test_long_operator_chain(run):
+    # one Python frame per operator would overflow the recursion limit
+    text = "ts rizz x tun tun sahur pmo\nts yap " + "touch x " * 5000 + "x pmo"
+    assert run(text) == "5001\n"
+
+
+def test_long_chain_check_mode():
+    tokens, lines = interpreter._lex_with_lines("ts yap " + "L " * 5000 + "sigma")
+    assert interpreter.check_tokens(tokens, lines) == [(1, "ts is never closed with pmo")]
+
+
+def test_expression_arguments_run_right_to_left(run):
+    text = """
+LEBRON pair a b ngl
+ts dih stroke a b pmo
+GOAT
+ts yap pair stroke legit a bro legit b bro pair legit c bro legit d bro pmo
+"""
+    assert run(text) == "abcd\n"
+
+
+def test_function_named_like_a_reserved_word(run):
+    text = """
+LEBRON add x y ngl
+ts dih touch x y pmo
+GOAT
+ts yap add 1 add 2 3 pmo
+"""
+    assert run(text) == "6\n"
+
+
+def test_reserved_word_is_not_an_expression():
+    with pytest.raises(interpreter.TSPMOError, match="Not a valid Expression add"):
+        interpreter.Interpreter().run_source("ts yap add pmo")
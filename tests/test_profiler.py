@@ -0,0 +1,73 @@
+import pytest
+
+import interpreter
+
+DEEP = """LEBRON down n ngl
+	ts hawk vibes n tun sahur pmo
+	ts lion pmo
+		ts dih n pmo
+	ts fr pmo
+	ts tiger pmo
+		ts rizz r down #shrink n tun tun sahur pmo
+		ts dih touch r tun tun sahur pmo
+	ts fr pmo
+	ts ong pmo
+GOAT
+LEBRON even n ngl
+	ts hawk vibes n tun sahur pmo
+	ts lion pmo
+		ts dih sigma pmo
+	ts fr pmo
+	ts tiger pmo
+		ts rizz r odd #shrink n tun tun sahur pmo
+		ts dih r pmo
+	ts fr pmo
+	ts ong pmo
+GOAT
+LEBRON odd n ngl
+	ts hawk vibes n tun sahur pmo
+	ts lion pmo
+		ts dih beta pmo
+	ts fr pmo
+	ts tiger pmo
+		ts rizz r even #shrink n tun tun sahur pmo
+		ts dih r pmo
+	ts fr pmo
+	ts ong pmo
+GOAT
+ts yap down DEPTH pmo
+ts yap even DEPTH pmo
+"""
+
+
+def profile(tmp_path, text):
+    script = tmp_path / "prof.tspmo"
+    script.write_text(text)
+    interp = interpreter.Interpreter()
+    interp.profiler = interpreter.Profiler()
+    assert interp.run_file(str(script)) == 0
+    out = tmp_path / "prof.collapsed"
+    interp.profiler.write_collapsed(out)
+    return interp.profiler, [line.rsplit(" ", 1)[0] for line in out.read_text().splitlines()]
+
+
+def test_recursion_folds_into_one_stack(tmp_path, capsys, no_disk_cache):
+    depth = 3000
+    prof, stacks = profile(tmp_path, DEEP.replace("DEPTH", "tun " * (depth + 1) + "sahur"))
+    assert capsys.readouterr().out.splitlines()[0].endswith(f"({depth})")
+    assert prof.calls["down"] == depth + 1 and prof.calls["odd"] == depth // 2
+    assert set(stacks) <= {"<main>", "<main>;down", "<main>;even", "<main>;even;odd"}
+    assert "<main>;down" in stacks
+    # inclusive time counts only the outermost of the recursive frames
+    assert prof.inclusive["down"] <= prof.inclusive["<main>"]
+    assert prof.frames == []
+
+
+def test_raising_native_leaves_profiler_balanced():
+    interp = interpreter.Interpreter()
+    interp.profiler = interpreter.Profiler()
+    interp.sym["a0"] = [1, "a"]
+    tokens, lines = interpreter._lex_with_lines("REF list DO SOMETHING\nts dih sort a0 pmo")
+    with pytest.raises(interpreter.TSPMOError):
+        interp.run_code(interpreter.assemble(interpreter.Parser(tokens, lines).parse()))
+    assert interp.profiler.frames == [] and interp.profiler.calls["sort"] == 1
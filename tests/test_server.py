@@ -0,0 +1,187 @@
+import random
+import threading
+from types import SimpleNamespace as NS
+
+import pytest
+
+pytest.importorskip("pygls")
+import server  # noqa: E402
+
+SOURCE = """REF list DO SOMETHING
+LEBRON add2 a b ngl
+    -> adds two
+       numbers <-
+    ts rizz t touch a b pmo
+    ts dih t pmo
+GOAT
+ts rizz x add2 1 2 pmo
+ts yap x pmo
+"""
+
+
+def change(l0, c0, l1, c1, text):
+    return NS(range=NS(start=NS(line=l0, character=c0), end=NS(line=l1, character=c1)), text=text)
+
+
+def random_edit(rng, lines):
+    l0 = rng.randrange(len(lines))
+    l1 = min(len(lines) - 1, l0 + rng.choice((0, 0, 1, 2)))
+    c0 = rng.randint(0, len(lines[l0]))
+    c1 = rng.randint(0 if l1 > l0 else c0, len(lines[l1]))
+    text = rng.choice(["", "x", " ts ", "\n", "pmo\nts yap ", "-> ", " <-", "LEBRON f ngl\n", "GOAT",
+                       "ts rizz y ", " a ngl ", "REF m DO "])
+    return change(l0, c0, l1, c1, text)
+
+
+def apply_text(lines, ch):
+    s, e = ch.range.start, ch.range.end
+    text = "\n".join(lines)
+    offset = lambda p: sum(len(l) + 1 for l in lines[:p.line]) + p.character
+    return text[:offset(s)] + ch.text + text[offset(e):]
+
+
+def test_apply_matches_full_tokenize():
+    rng = random.Random(3)
+    index = server.DocIndex(SOURCE)
+    for version in range(500):
+        ch = random_edit(rng, index.lines)
+        expected = apply_text(index.lines, ch)
+        index.apply(ch, version)
+        full = server.DocIndex(expected)
+        assert index.lines == full.lines
+        assert index.tokens == full.tokens
+        assert index.version == version
+
+
+def scope_table(index):
+    return [index.scope_at(ln, col) for ln, toks in enumerate(index.tokens)
+            for col in {0, *(c for start, tok in toks for c in (start, start + len(tok)))}]
+
+
+def test_scopes_follow_edits():
+    rng = random.Random(5)
+    index = server.DocIndex(SOURCE)
+    for version in range(300):
+        index.apply(random_edit(rng, index.lines), version)
+        full = server.DocIndex("\n".join(index.lines))
+        assert scope_table(index) == scope_table(full)
+        assert index.imports() == full.imports()
+
+
+def test_scope_at():
+    index = server.DocIndex(SOURCE)
+    assert index.scope_at(0, 0) == (["add2"], ["x"], None)
+    assert index.scope_at(1, 18) == (["add2"], ["x"], None)  # before ngl
+    assert index.scope_at(1, 21) == (["add2"], ["x"], (["a", "b"], ["t"]))
+    assert index.scope_at(6, 0) == (["add2"], ["x"], None)  # at GOAT
+    index.apply(change(4, 12, 4, 13, "u"))
+    assert index.scope_at(5, 0)[2] == (["a", "b"], ["u"])
+
+
+def test_edit_rescans_until_state_settles(monkeypatch):
+    body = "LEBRON f a ngl\n" + "ts rizz y a pmo\n" * 2000 + "GOAT\n"
+    index = server.DocIndex(body + "ts rizz g 1 pmo\n" * 2000)
+    scanned = []
+    real = server.scan_line
+    monkeypatch.setattr(server, "scan_line", lambda *a: scanned.append(a) or real(*a))
+    index.apply(change(3000, 8, 3000, 9, "h"))
+    assert len(scanned) == 1
+    assert index.scope_at(0, 0)[1] == ["g", "h"]
+
+    index = server.DocIndex(SOURCE)
+    index.apply(NS(text="ts yap x pmo"), 2)
+    assert index.lines == ["ts yap x pmo"] and index.tokens == [[(0, "ts"), (3, "yap"), (7, "x"), (9, "pmo")]]
+
+
+def test_full_replace():
+    index = server.DocIndex(SOURCE)
+    index.apply(NS(text="ts yap x pmo"), 2)
+    assert index.lines == ["ts yap x pmo"] and index.tokens == [[(0, "ts"), (3, "yap"), (7, "x"), (9, "pmo")]]
+    assert index.scope_at(0, 0) == ([], [], None) and index.imports() == ()
+
+
+def test_views_follow_edits():
+    index = server.DocIndex(SOURCE)
+    assert index.docstrings() == {"add2": "adds two\n       numbers"}
+    index.apply(change(1, 7, 1, 11, "plus"))
+    assert list(index.docstrings()) == ["plus"]
+    assert index.imports() == ("list",)
+
+
+def test_lint_sees_one_version():
+    # lint runs on the debounce thread while did_change edits the same index.
+    # Each edit swaps every line at once between two valid documents; a lint
+    # that read half of each would see a comment opened or closed alone.
+    filler = "ts yap x pmo\n" * 3000
+    a = "->\n" + filler + "<-"
+    b = "ts yap x pmo\n" + filler + "ts yap x pmo"
+    index = server.DocIndex(a)
+    last = len(index.lines) - 1
+    stop = threading.Event()
+
+    def edit():
+        text = b
+        while not stop.is_set():
+            index.apply(change(0, 0, last, len(index.lines[last]), text))
+            text = a if text is b else b
+
+    t = threading.Thread(target=edit)
+    t.start()
+    try:
+        diags = [d.message for _ in range(30) for d in server.lint_text(index)]
+    finally:
+        stop.set()
+        t.join()
+    assert diags == []
+
+
+def lint(text):
+    return [((d.range.start.line, d.range.start.character, d.range.end.character), d.severity.name)
+            for d in server.lint_text(server.DocIndex(text))]
+
+
+def test_lint_reports_structure_at_its_token():
+    assert lint("ts yap tun sahur pmo\n  ts yap 1\n") == [((1, 2, 4), "Error")]
+    assert lint(SOURCE) == []
+
+
+def test_lint_reports_flags_at_the_unmatched_token():
+    text = ("ts hawk sigma pmo\n"
+            "ts lion pmo\n"
+            "    ts yap legit fr ong bro pmo\n"
+            "ts fr pmo\n"
+            "ts tiger pmo\n")
+    assert lint(text) == [((0, 3, 7), "Warning"), ((4, 3, 8), "Error")]
+    assert lint("ts ong pmo\nts fr pmo\n") == [((0, 3, 6), "Warning"), ((1, 3, 5), "Warning")]
+
+
+def test_lint_pairs_flags_by_block():
+    # an ong in a loop body may pop a hawk from before the loop, but a
+    # function body has flags of its own
+    loop = "ts hawk sigma pmo\nts sybau sigma yo pmo\nts kid pmo\n  ts ong pmo\nts gurt pmo\n"
+    assert lint(loop) == []
+    assert lint("ts hawk sigma pmo\nLEBRON f ngl ts ong pmo GOAT\nts ong pmo\n") == [((1, 16, 19), "Warning")]
+
+
+def test_module_index(tmp_path):
+    std, user = tmp_path / "stdlib", tmp_path / "userlib"
+    std.mkdir()
+    user.mkdir()
+    (std / "a.pmo").write_text("REF b DO SOMETHING\nLEBRON twice x ngl\n  -> doubles x <-\n  ts dih touch x x pmo\nGOAT\n")
+    (user / "b.pmo").write_text("LEBRON half x ngl ts dih x pmo GOAT\n")
+    (user / "a.pmo").write_text("LEBRON shadowed ngl GOAT\n")
+    index = server.ModuleIndex([std, user])
+    index.build()
+
+    found = index.visible(("a",))
+    assert sorted(found) == ["half", "twice"]
+    twice = found["twice"]
+    assert (twice.params, twice.doc, twice.module, twice.line, twice.col) == (["x"], "doubles x", "a", 1, 7)
+    assert index.visible(("a",)) is found
+
+    (user / "b.pmo").write_text("LEBRON third x ngl ts dih x pmo GOAT\n")
+    index.update(user / "b.pmo")
+    assert sorted(index.visible(("a",))) == ["third", "twice"]
+    index.remove(std / "a.pmo")
+    assert sorted(index.visible(("a",))) == ["shadowed"]
+    assert index.covers(user / "c.pmo") and not index.covers(tmp_path / "c.pmo")